@@ -1,11 +1,25 @@
-import requests
+import argparse
+import logging
 import json
 import time
 import datetime
 import sys
 import os
+import threading
+
+from iclass_core import DEFAULT_RATE_LIMITS, JSON_BACKEND
+from schedule_cache import ScheduleCache
+from semester_index import SEMESTER_WEEKS, SemesterIndex
+from settings import SessionStore, load_settings, rate_limit_overrides
+from sign_journal import SignJournal
 
 student_id = ''  # 请填写你的学号
+FETCH_CONCURRENCY = 8  # 并发获取课程表的最大请求数
+SCAN_MAX_DAYS = 120  # 连续打卡最多检查的天数
+SCAN_EMPTY_DAYS = 7  # 连续打卡遇到多少天没课后停止
+
+# 批处理模式的 on_request 在多个获取线程中调用，每行 JSON 在锁内一次写出，避免行与行交错
+_emit_lock = threading.Lock()
 
 
 # 颜色代码
@@ -73,188 +87,144 @@ def get_date_input(prompt):
 
 
 def login():
-    """登录并获取用户ID和sessionId"""
+    """输入学号并登录，成功时返回已登录的 IClassClient，失败返回 None"""
     print_header("登录系统")
+    student_id = input(f"{Colors.BLUE}请输入学号: {Colors.END}")
+    # 网络层 (requests) 在这里才导入，启动后可以立即输入学号
+    from iclass_client import IClassClient, NetworkError
+    client = IClassClient(cache=ScheduleCache(), journal=SignJournal(), session_store=SessionStore(),
+                          rate_limits=rate_limit_overrides(load_settings()))
+    if client.resume(student_id):
+        # 会话失效时客户端会自动重新登录
+        print(f"{Colors.GREEN}✓ 使用已保存的登录会话: userId={client.userId}{Colors.END}")
+        return client
     print(f"{Colors.YELLOW}正在登录...{Colors.END}")
 
-    url = 'https://iclass.buaa.edu.cn:8346/app/user/login.action'
-    para = {
-        'phone': input(f"{Colors.BLUE}请输入学号: {Colors.END}"),
-        'userLevel': '1',
-        'verificationType': '2',
-        'verificationUrl': ''
-    }
-
     try:
-        res = requests.get(url=url, params=para, timeout=10)
-        print(f"{Colors.BLUE}登录响应状态码: {res.status_code}{Colors.END}")
-
-        # 尝试解析JSON
-        userData = json.loads(res.text)
-
-        if userData.get('STATUS') != '0':
-            print(f"{Colors.RED}登录失败: {userData.get('ERRORMSG', '未知错误')}{Colors.END}")
-            input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
-            return None, None
+        userData = client.login(student_id)
 
-        userId = userData['result']['id']
-        sessionId = userData['result']['sessionId']
-        print(f"{Colors.GREEN}✓ 登录成功: userId={userId}, sessionId={sessionId}{Colors.END}")
-        time.sleep(1)
-        return userId, sessionId
+        if userData.get('STATUS') == '0':
+            print(f"{Colors.GREEN}✓ 登录成功: userId={client.userId}, sessionId={client.sessionId}{Colors.END}")
+            time.sleep(1)
+            return client
 
+        print(f"{Colors.RED}登录失败: {userData.get('ERRORMSG', '未知错误')}{Colors.END}")
     except json.JSONDecodeError as e:
         print(f"{Colors.RED}JSON解析错误: {e}{Colors.END}")
         print(f"{Colors.RED}响应内容不是有效的JSON格式{Colors.END}")
-        input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
-        return None, None
-    except requests.RequestException as e:
+    except NetworkError as e:
         print(f"{Colors.RED}网络请求错误: {e}{Colors.END}")
-        input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
-        return None, None
     except KeyError as e:
         print(f"{Colors.RED}响应数据缺少必要字段: {e}{Colors.END}")
-        input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
-        return None, None
+    input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
+    client.close()
+    return None
 
 
-def get_course_schedule(userId, sessionId, dateStr):
-    """获取指定日期的课程表"""
-    url = 'https://iclass.buaa.edu.cn:8346/app/course/get_stu_course_sched.action'
-    para = {
-        'dateStr': dateStr,
-        'id': userId
-    }
-    headers = {
-        'sessionId': sessionId,
-    }
+def print_schedule_error(date_str, message):
+    print(f"{Colors.RED}获取 {date_str} 课程表失败: {message}{Colors.END}")
 
-    try:
-        res = requests.get(url=url, params=para, headers=headers, timeout=10)
-        return json.loads(res.text)
-    except Exception as e:
-        print(f"{Colors.RED}获取课程表失败: {e}{Colors.END}")
-        return None
+
+def date_range(start_date_str, days):
+    """从开始日期起连续 days 天的日期字符串列表"""
+    start_date = datetime.datetime.strptime(start_date_str, '%Y%m%d')
+    return [(start_date + datetime.timedelta(days=i)).strftime('%Y%m%d') for i in range(days)]
 
 
-def sign_course(userId, courseSchedId):
+def sign_course(client, courseSchedId):
     """课程打卡"""
-    params = {
-        'id': userId
-    }
-    current_timestamp_milliseconds = int(time.time() * 1000)
-    url = f'http://iclass.buaa.edu.cn:8081/app/course/stu_scan_sign.action?courseSchedId={courseSchedId}&timestamp={current_timestamp_milliseconds}'
-
     try:
-        r = requests.post(url=url, params=params, timeout=10)
-        return r.ok
+        return client.sign_course(courseSchedId)
     except Exception as e:
         print(f"{Colors.RED}打卡请求失败: {e}{Colors.END}")
         return False
 
 
-def process_single_day(userId, sessionId, date_str):
+def course_line(course):
+    """打卡结果中的一行：日期、课程名与上课时间"""
+    return f"{course.date_text}\t{course.name}\t{course.time_text}"
+
+
+def process_single_day(client, index, date_str):
     """处理单个日期的打卡"""
+    handle_day_schedule(client, date_str, index.day(date_str))
+
+
+def handle_day_schedule(client, date_str, courses):
+    """展示已获取的单日课程表，并按用户选择打卡"""
     print_header(f"处理日期: {date_str}")
 
-    json_data = get_course_schedule(userId, sessionId, date_str)
-    if json_data is None:
+    if courses is None:
         print(f"{Colors.RED}获取课程表失败{Colors.END}")
         input(f"{Colors.YELLOW}按回车键返回...{Colors.END}")
         return
 
-    if json_data['STATUS'] == '0' and 'result' in json_data:
-        courses = json_data['result']
-        if not courses:
-            print(f"{Colors.YELLOW}{date_str} 没有课程{Colors.END}")
-            input(f"{Colors.YELLOW}按回车键返回...{Colors.END}")
-            return
-
-        print(f"{Colors.GREEN}{date_str} 有 {len(courses)} 门课程:{Colors.END}")
-        print()
+    if not courses:
+        print(f"{Colors.YELLOW}{date_str} 没有课程{Colors.END}")
+        input(f"{Colors.YELLOW}按回车键返回...{Colors.END}")
+        return
 
-        for i, item in enumerate(courses, 1):
-            courseSchedId = item['id']
-            courseName = item['courseName']
-            classBeginTime = item['classBeginTime']
-            classEndTime = item['classEndTime']
+    print(f"{Colors.GREEN}{date_str} 有 {len(courses)} 门课程:{Colors.END}")
+    print()
 
-            date_display = classBeginTime[:10]
-            begin = classBeginTime[11:16]
-            end = classEndTime[11:16]
+    for i, course in enumerate(courses, 1):
+        print(f"{Colors.CYAN}{i}. {course.name}{Colors.END}")
+        print(f"   时间: {course.time_text}")
+        print(f"   日期: {course.date_text}")
+        print()
 
-            print(f"{Colors.CYAN}{i}. {courseName}{Colors.END}")
-            print(f"   时间: {begin}-{end}")
-            print(f"   日期: {date_display}")
-            print()
+    print(f"{Colors.YELLOW}请选择要打卡的课程:{Colors.END}")
+    print(f"  {Colors.GREEN}a{Colors.END} - 打卡所有课程")
+    print(f"  {Colors.YELLOW}1-{len(courses)}{Colors.END} - 打卡指定课程")
+    print(f"  {Colors.RED}q{Colors.END} - 返回主菜单")
+    print()
 
-        print(f"{Colors.YELLOW}请选择要打卡的课程:{Colors.END}")
-        print(f"  {Colors.GREEN}a{Colors.END} - 打卡所有课程")
-        print(f"  {Colors.YELLOW}1-{len(courses)}{Colors.END} - 打卡指定课程")
-        print(f"  {Colors.RED}q{Colors.END} - 返回主菜单")
-        print()
+    choice = input(f"{Colors.GREEN}请输入选择: {Colors.END}").lower()
 
-        choice = input(f"{Colors.GREEN}请输入选择: {Colors.END}").lower()
+    if choice == 'q':
+        return
+    elif choice == 'a':
+        # 打卡所有课程
+        for course in courses:
+            if client.is_signed(course.id):
+                print(f"{Colors.YELLOW}- 已打过卡，跳过: {course_line(course)}{Colors.END}")
+                continue
 
-        if choice == 'q':
-            return
-        elif choice == 'a':
-            # 打卡所有课程
-            for i, item in enumerate(courses, 1):
-                courseSchedId = item['id']
-                courseName = item['courseName']
-                classBeginTime = item['classBeginTime']
-                classEndTime = item['classEndTime']
-
-                date_display = classBeginTime[:10]
-                begin = classBeginTime[11:16]
-                end = classEndTime[11:16]
-
-                print(f"{Colors.BLUE}正在打卡: {courseName}...{Colors.END}")
-                if sign_course(userId, courseSchedId):
-                    print(f"{Colors.GREEN}✓ 已打卡: {date_display}\t{courseName}\t{begin}-{end}{Colors.END}")
-                else:
-                    print(f"{Colors.RED}✗ 打卡失败: {date_display}\t{courseName}\t{begin}-{end}{Colors.END}")
-                time.sleep(1)  # 稍微延迟一下，避免请求过快
-        elif choice.isdigit() and 1 <= int(choice) <= len(courses):
-            # 打卡指定课程
-            idx = int(choice) - 1
-            item = courses[idx]
-            courseSchedId = item['id']
-            courseName = item['courseName']
-            classBeginTime = item['classBeginTime']
-            classEndTime = item['classEndTime']
-
-            date_display = classBeginTime[:10]
-            begin = classBeginTime[11:16]
-            end = classEndTime[11:16]
-
-            print(f"{Colors.BLUE}正在打卡: {courseName}...{Colors.END}")
-            if sign_course(userId, courseSchedId):
-                print(f"{Colors.GREEN}✓ 已打卡: {date_display}\t{courseName}\t{begin}-{end}{Colors.END}")
+            print(f"{Colors.BLUE}正在打卡: {course.name}...{Colors.END}")
+            if sign_course(client, course.id):
+                print(f"{Colors.GREEN}✓ 已打卡: {course_line(course)}{Colors.END}")
             else:
-                print(f"{Colors.RED}✗ 打卡失败: {date_display}\t{courseName}\t{begin}-{end}{Colors.END}")
+                print(f"{Colors.RED}✗ 打卡失败: {course_line(course)}{Colors.END}")
+    elif choice.isdigit() and 1 <= int(choice) <= len(courses):
+        # 打卡指定课程
+        course = courses[int(choice) - 1]
+
+        print(f"{Colors.BLUE}正在打卡: {course.name}...{Colors.END}")
+        if sign_course(client, course.id):
+            print(f"{Colors.GREEN}✓ 已打卡: {course_line(course)}{Colors.END}")
         else:
-            print(f"{Colors.RED}无效选择{Colors.END}")
-
-        input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
+            print(f"{Colors.RED}✗ 打卡失败: {course_line(course)}{Colors.END}")
     else:
-        print(f"{Colors.RED}获取课程表失败: {json_data.get('ERRORMSG', '未知错误')}{Colors.END}")
-        input(f"{Colors.YELLOW}按回车键返回...{Colors.END}")
+        print(f"{Colors.RED}无效选择{Colors.END}")
+
+    input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
 
 
-def process_date_range(userId, sessionId, start_date_str, end_date_str):
+def process_date_range(client, index, start_date_str, end_date_str):
     """处理日期范围内的打卡"""
     start_date = datetime.datetime.strptime(start_date_str, '%Y%m%d')
     end_date = datetime.datetime.strptime(end_date_str, '%Y%m%d')
+    date_strs = date_range(start_date_str, (end_date - start_date).days + 1)
 
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime('%Y%m%d')
-        process_single_day(userId, sessionId, date_str)
+    # 一次性从索引查询整个范围，过期的日期并发获取，再按日期顺序逐天处理
+    print(f"{Colors.YELLOW}正在获取 {len(date_strs)} 天的课程表...{Colors.END}")
+    schedules = index.ensure(date_strs)
+
+    for i, (date_str, courses) in enumerate(schedules):
+        handle_day_schedule(client, date_str, courses)
 
         # 询问是否继续下一天
-        if current_date < end_date:
+        if i < len(schedules) - 1:
             print(f"{Colors.YELLOW}是否继续处理下一天 ({date_str})?{Colors.END}")
             print(f"  {Colors.GREEN}y{Colors.END} - 继续")
             print(f"  {Colors.RED}n{Colors.END} - 返回主菜单")
@@ -263,90 +233,67 @@ def process_date_range(userId, sessionId, start_date_str, end_date_str):
             if answer != 'y':
                 break
 
-        current_date += datetime.timedelta(days=1)
-
 
-def process_continuous_days(userId, sessionId, start_date_str):
+def process_continuous_days(client, index, start_date_str):
     """从指定日期开始连续打卡，直到连续7天没课"""
     cnt = 0  # 连续没课的天数
-    current_date = datetime.datetime.strptime(start_date_str, '%Y%m%d')
 
-    for i in range(120):  # 最多检查120天
-        if cnt == 7:
-            print(f"{Colors.YELLOW}连续7天没课，可能是假期，程序退出{Colors.END}")
-            input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
-            break
-
-        date_str = current_date.strftime('%Y%m%d')
+    # 最多检查120天，游标之前的若干天预先并发获取，仍按日期顺序逐天处理
+    for date_str, courses in index.scan(start_date_str, SCAN_MAX_DAYS, SCAN_EMPTY_DAYS, FETCH_CONCURRENCY):
         print_header(f"检查日期: {date_str}")
 
-        # 查询课表
-        json_data = get_course_schedule(userId, sessionId, date_str)
-        if json_data is None:
-            current_date += datetime.timedelta(days=1)
+        if courses is None:
             continue
 
-        if json_data['STATUS'] == '0' and 'result' in json_data:
-            courses = json_data['result']
-            if not courses:
-                print(f"{Colors.YELLOW}{date_str} 没有课程{Colors.END}")
-                cnt += 1
-                current_date += datetime.timedelta(days=1)
-
-                # 每检查5天提示一次进度
-                if cnt % 5 == 0:
-                    print(f"{Colors.BLUE}已连续 {cnt} 天没有课程{Colors.END}")
-                    input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
-                continue
-
-            cnt = 0  # 重置连续没课计数
-            print(f"{Colors.GREEN}{date_str} 有 {len(courses)} 门课程:{Colors.END}")
-            print()
-
-            for item in courses:
-                courseSchedId = item['id']
-                courseName = item['courseName']
-                classBeginTime = item['classBeginTime']
-                classEndTime = item['classEndTime']
+        if not courses:
+            print(f"{Colors.YELLOW}{date_str} 没有课程{Colors.END}")
+            cnt += 1
 
-                date_display = classBeginTime[:10]
-                begin = classBeginTime[11:16]
-                end = classEndTime[11:16]
+            # 每检查5天提示一次进度
+            if cnt % 5 == 0:
+                print(f"{Colors.BLUE}已连续 {cnt} 天没有课程{Colors.END}")
+                input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
+            continue
 
-                print(f"{Colors.CYAN}课程: {courseName}{Colors.END}")
-                print(f"时间: {begin}-{end}")
+        cnt = 0  # 重置连续没课计数
+        print(f"{Colors.GREEN}{date_str} 有 {len(courses)} 门课程:{Colors.END}")
+        print()
 
-                # 执行打卡
-                print(f"{Colors.BLUE}正在打卡...{Colors.END}")
-                if sign_course(userId, courseSchedId):
-                    print(f"{Colors.GREEN}✓ 已打卡: {date_display}\t{courseName}\t{begin}-{end}{Colors.END}")
-                else:
-                    print(f"{Colors.RED}✗ 打卡失败: {date_display}\t{courseName}\t{begin}-{end}{Colors.END}")
+        for course in courses:
+            print(f"{Colors.CYAN}课程: {course.name}{Colors.END}")
+            print(f"时间: {course.time_text}")
 
-                time.sleep(1)  # 稍微延迟一下，避免请求过快
+            # 执行打卡，打卡记录中已成功的课程不再重复请求
+            if client.is_signed(course.id):
+                print(f"{Colors.YELLOW}- 已打过卡，跳过{Colors.END}")
+                continue
+            print(f"{Colors.BLUE}正在打卡...{Colors.END}")
+            if sign_course(client, course.id):
+                print(f"{Colors.GREEN}✓ 已打卡: {course_line(course)}{Colors.END}")
+            else:
+                print(f"{Colors.RED}✗ 打卡失败: {course_line(course)}{Colors.END}")
 
-            print()
-            print(f"{Colors.YELLOW}是否继续处理下一天?{Colors.END}")
-            print(f"  {Colors.GREEN}y{Colors.END} - 继续")
-            print(f"  {Colors.RED}n{Colors.END} - 返回主菜单")
-            print()
-            answer = input(f"{Colors.GREEN}请输入选择: {Colors.END}").lower()
-            if answer != 'y':
-                print(f"{Colors.YELLOW}用户选择退出{Colors.END}")
-                return
+        print()
+        print(f"{Colors.YELLOW}是否继续处理下一天?{Colors.END}")
+        print(f"  {Colors.GREEN}y{Colors.END} - 继续")
+        print(f"  {Colors.RED}n{Colors.END} - 返回主菜单")
+        print()
+        answer = input(f"{Colors.GREEN}请输入选择: {Colors.END}").lower()
+        if answer != 'y':
+            print(f"{Colors.YELLOW}用户选择退出{Colors.END}")
+            return
 
-            current_date += datetime.timedelta(days=1)
-        else:
-            print(f"{Colors.RED}获取课程表失败: {json_data.get('ERRORMSG', '未知错误')}{Colors.END}")
-            cnt += 1
-            current_date += datetime.timedelta(days=1)
+    if cnt == SCAN_EMPTY_DAYS:
+        print(f"{Colors.YELLOW}连续7天没课，可能是假期，程序退出{Colors.END}")
+        input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
 
 
-def main():
+def run_interactive():
     # 首先登录
-    userId, sessionId = login()
-    if not userId or not sessionId:
+    client = login()
+    if client is None:
         return
+    index = SemesterIndex(client, on_error=print_schedule_error, concurrency=FETCH_CONCURRENCY)
 
     while True:
         print_header("课程打卡系统")
@@ -357,12 +304,13 @@ def main():
             "指定单个日期打卡",
             "指定日期范围打卡",
             "从指定日期开始连续打卡",
+            "清除课程表缓存",
             "退出系统"
         ]
 
         print_menu(menu_options)
 
-        choice = get_choice("请选择操作", 1, 4)
+        choice = get_choice("请选择操作", 1, 5)
 
         if choice == 'q':
             break
@@ -372,7 +320,7 @@ def main():
             date_str = get_date_input("请输入要打卡的日期")
             if date_str == 'q':
                 continue
-            process_single_day(userId, sessionId, date_str)
+            process_single_day(client, index, date_str)
 
         elif choice == 2:
             # 指定日期范围
@@ -382,19 +330,246 @@ def main():
             end_date = get_date_input("请输入结束日期")
             if end_date == 'q':
                 continue
-            process_date_range(userId, sessionId, start_date, end_date)
+            process_date_range(client, index, start_date, end_date)
 
         elif choice == 3:
             # 从指定日期开始连续打卡
             start_date = get_date_input("请输入开始日期")
             if start_date == 'q':
                 continue
-            process_continuous_days(userId, sessionId, start_date)
+            process_continuous_days(client, index, start_date)
 
         elif choice == 4:
+            # 清除当前用户的课程表缓存
+            count = client.cache.invalidate(client.userId)
+            index.invalidate()
+            print(f"{Colors.GREEN}✓ 已清除 {count} 条课程表缓存{Colors.END}")
+            input(f"{Colors.YELLOW}按回车键继续...{Colors.END}")
+
+        elif choice == 5:
             print(f"{Colors.GREEN}感谢使用课程打卡系统，再见!{Colors.END}")
             break
 
+    # 选择 "退出系统" 与输入 q 退出时都打印本次运行的统计
+    print(f"{Colors.BLUE}{client.cache.stats_text()}")
+    print("\n".join(client.metrics.summary_lines()) + Colors.END)
+    client.close()
+
+
+def emit(event, **fields):
+    """批处理模式的输出：每个事件一行 JSON (JSON Lines)"""
+    line = json.dumps({'event': event, **fields}, ensure_ascii=False)
+    with _emit_lock:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+
+def emit_request(endpoint, params, elapsed, result):
+    fields = {'endpoint': endpoint, 'elapsed_ms': round(elapsed * 1000, 1)}
+    if params and 'dateStr' in params:
+        fields['date'] = params['dateStr']
+    if params and 'courseSchedId' in params:
+        fields['courseSchedId'] = params['courseSchedId']
+    if isinstance(result, Exception):
+        fields['error'] = str(result)
+    else:
+        fields['status'] = result
+    emit('request', **fields)
+
+
+def run_batch(args):
+    """非交互批处理：处理完整个日期范围，不等待任何输入，结果以 JSON Lines 输出到标准输出"""
+    from iclass_client import IClassClient, NetworkError
+    started = time.perf_counter()
+    client = IClassClient(cache=None if args.no_cache else ScheduleCache(), journal=SignJournal(),
+                          base_url=args.base_url, sign_base_url=args.sign_base_url,
+                          session_store=None if args.no_session_reuse else SessionStore(),
+                          rate_limits={**rate_limit_overrides(load_settings()), **dict(args.rate_limit)})
+    client.on_request = emit_request
+    try:
+        if client.resume(args.student_id):
+            emit('login', ok=True, userId=client.userId, resumed=True)
+        else:
+            try:
+                userData = client.login(args.student_id)
+            except (NetworkError, ValueError, KeyError) as e:
+                emit('login', ok=False, error=str(e))
+                return 1
+            if userData.get('STATUS') != '0':
+                emit('login', ok=False, error=userData.get('ERRORMSG', '未知错误'))
+                return 1
+            emit('login', ok=True, userId=client.userId, resumed=False)
+
+        if args.command == 'export':
+            return batch_export(client, args, started)
+        index = SemesterIndex(client, concurrency=args.concurrency,
+                              on_error=lambda date_str, message: emit('error', date=date_str, error=message))
+        if args.command == 'day':
+            days = index.ensure([args.date])
+        elif args.command == 'range':
+            start_date = datetime.datetime.strptime(args.start, '%Y%m%d')
+            end_date = datetime.datetime.strptime(args.end, '%Y%m%d')
+            days = index.ensure(date_range(args.start, (end_date - start_date).days + 1))
+        else:
+            days = index.scan(args.start, args.max_days, args.empty_days, args.window or args.concurrency)
+
+        summary = {'days': 0, 'failed_days': 0, 'courses': 0, 'signed': 0, 'sign_failed': 0, 'skipped': 0}
+        for date_str, courses in days:
+            summary['days'] += 1
+            if courses is None:
+                summary['failed_days'] += 1
+                emit('day', date=date_str, ok=False)
+                continue
+            emit('day', date=date_str, ok=True, courses=[
+                {'courseSchedId': course.id, 'courseName': course.name,
+                 'begin': f"{course.begin:%Y-%m-%d %H:%M:%S}", 'end': f"{course.end:%Y-%m-%d %H:%M:%S}"}
+                for course in courses])
+            summary['courses'] += len(courses)
+            if args.list_only:
+                continue
+            for course in courses:
+                # 打卡记录中已确认成功的课程跳过，只重试失败或未打过的
+                if not args.force and client.is_signed(course.id):
+                    summary['skipped'] += 1
+                    emit('sign', date=date_str, courseSchedId=course.id, courseName=course.name, ok=True,
+                         skipped=True)
+                    continue
+                ok = _batch_sign(client, course.id)
+                summary['signed' if ok else 'sign_failed'] += 1
+                emit('sign', date=date_str, courseSchedId=course.id, courseName=course.name, ok=ok)
+
+        emit('summary', ok=summary['failed_days'] == 0 and summary['sign_failed'] == 0,
+             elapsed_ms=round((time.perf_counter() - started) * 1000, 1), retries=dict(client.retry_counts),
+             relogins=client.relogins,
+             **summary)
+        return 0 if summary['failed_days'] == 0 and summary['sign_failed'] == 0 else 1
+    finally:
+        if args.stats:
+            emit_stats(client)
+        client.close()
+
+
+def batch_export(client, args, started):
+    """把从 args.start 起 args.weeks 周的课程表流式导出到 args.output (.ics / .csv)，输出 export 与 summary 事件"""
+    from schedule_export import export_semester, semester_days
+    summary = {'days': 0, 'failed_days': 0}
+
+    def counted(days):
+        for date_str, courses in days:
+            summary['days'] += 1
+            summary['failed_days'] += courses is None
+            yield date_str, courses
+
+    days = semester_days(client, datetime.datetime.strptime(args.start, '%Y%m%d'), args.weeks, args.concurrency,
+                         on_error=lambda date_str, message: emit('error', date=date_str, error=message))
+    try:
+        count = export_semester(counted(days), args.output, args.format)
+    except (OSError, ValueError) as e:
+        emit('export', ok=False, path=args.output, error=str(e))
+        return 1
+    emit('export', ok=True, path=args.output, courses=count)
+    emit('summary', ok=summary['failed_days'] == 0, elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+         retries=dict(client.retry_counts), relogins=client.relogins, courses=count, **summary)
+    return 0 if summary['failed_days'] == 0 else 1
+
+
+def emit_stats(client):
+    """输出各接口的请求统计 (时间单位为毫秒，wait 为限速等待)、缓存命中情况与使用的 JSON 解析库"""
+    endpoints = {endpoint: {key: round(value * 1000, 1) if key in ('p50', 'p95', 'p99', 'wait') else value
+                            for key, value in stats.items()}
+                 for endpoint, stats in client.metrics.snapshot().items()}
+    cache = {'hits': client.cache.hits, 'misses': client.cache.misses} if client.cache else None
+    emit('stats', endpoints=endpoints, cache=cache, json_backend=JSON_BACKEND)
+
+
+def _batch_sign(client, courseSchedId):
+    try:
+        return client.sign_course(courseSchedId)
+    except Exception:
+        # 失败原因已经通过 request 事件输出
+        return False
+
+
+def parse_date(value):
+    try:
+        datetime.datetime.strptime(value, '%Y%m%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式错误: {value} (应为 YYYYMMDD)")
+    return value
+
+
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"应为正整数: {value}")
+    return number
+
+
+def parse_rate_limit(value):
+    """--rate-limit 的参数 ENDPOINT=RATE[:BURST[:MAX_RATE]]，返回 (endpoint, (rate, ...))"""
+    try:
+        endpoint, spec = value.split('=', 1)
+        numbers = tuple(float(v) for v in spec.split(':'))
+    except ValueError:
+        numbers = ()
+    if not numbers or len(numbers) > 3 or min(numbers) <= 0:
+        raise argparse.ArgumentTypeError(f"限速格式错误: {value} (应为 ENDPOINT=RATE[:BURST[:MAX_RATE]])")
+    if endpoint not in DEFAULT_RATE_LIMITS:
+        raise argparse.ArgumentTypeError(f"未知的限速接口: {endpoint} (可选 {', '.join(DEFAULT_RATE_LIMITS)})")
+    return endpoint, numbers
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="北航 iClass 课程打卡。不带子命令时进入交互菜单，"
+                                                 "带子命令时以批处理模式运行并输出 JSON Lines。")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-u', '--student-id', required=True, help="学号")
+    common.add_argument('--list-only', action='store_true', help="只获取课程表，不打卡")
+    common.add_argument('--concurrency', type=positive_int, default=FETCH_CONCURRENCY, help="并发获取课程表的最大请求数")
+    common.add_argument('--no-cache', action='store_true', help="不读写本地课程表缓存")
+    common.add_argument('--stats', action='store_true', help="结束时输出各接口的延迟、错误率与缓存命中统计")
+    common.add_argument('--base-url', help="登录与课程表接口的服务器地址 (默认 $ICLASS_BASE_URL 或 iClass 官方地址)")
+    common.add_argument('--sign-base-url', help="打卡接口的服务器地址 (默认 $ICLASS_SIGN_BASE_URL 或 iClass 官方地址)")
+    common.add_argument('--rate-limit', action='append', type=parse_rate_limit, default=[],
+                        metavar='ENDPOINT=RATE[:BURST[:MAX_RATE]]',
+                        help="覆盖某个接口 (login / schedule / sign) 的初始速率、突发上限与最高速率，可重复指定")
+    common.add_argument('--no-session-reuse', action='store_true', help="每次都重新登录，不读取也不保存登录会话")
+    common.add_argument('--force', action='store_true', help="忽略打卡记录，已打过卡的课程也重新打卡")
+
+    subparsers = parser.add_subparsers(dest='command')
+    day = subparsers.add_parser('day', parents=[common], help="处理单个日期")
+    day.add_argument('date', type=parse_date, help="日期 YYYYMMDD")
+    date_range_parser = subparsers.add_parser('range', parents=[common], help="处理日期范围 (含首尾)")
+    date_range_parser.add_argument('start', type=parse_date, help="开始日期 YYYYMMDD")
+    date_range_parser.add_argument('end', type=parse_date, help="结束日期 YYYYMMDD")
+    scan = subparsers.add_parser('scan', parents=[common], help="从指定日期开始连续处理，直到连续多天没课")
+    scan.add_argument('start', type=parse_date, help="开始日期 YYYYMMDD")
+    scan.add_argument('--max-days', type=positive_int, default=SCAN_MAX_DAYS, help="最多检查的天数")
+    scan.add_argument('--empty-days', type=positive_int, default=SCAN_EMPTY_DAYS, help="连续多少天没课后停止")
+    scan.add_argument('--window', type=positive_int, help="在当前日期之前预先并发获取的天数 (默认同 --concurrency)")
+    export = subparsers.add_parser('export', parents=[common], help="把整个学期的课程表导出为 iCalendar 或 CSV 文件")
+    export.add_argument('start', type=parse_date, help="学期第一周周一的日期 YYYYMMDD")
+    export.add_argument('-o', '--output', required=True, help="输出文件路径 (.ics 或 .csv)")
+    export.add_argument('--format', choices=['ics', 'csv'], help="输出格式 (默认按 --output 的扩展名判断)")
+    export.add_argument('--weeks', type=positive_int, default=SEMESTER_WEEKS, help="导出的周数")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'range' and args.end < args.start:
+        parser.error(f"结束日期 {args.end} 早于开始日期 {args.start}")
+    # 网络层的重试与熔断日志输出到 stderr，不影响批处理模式在 stdout 上的 JSON Lines
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if args.command is None:
+        run_interactive()
+        return 0
+    return run_batch(args)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
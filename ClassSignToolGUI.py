@@ -2,13 +2,25 @@ import tkinter as tk
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.tooltip import ToolTip
-import requests
-import json
-import time
+import logging
+import logging.handlers
+import os
+import queue
 import datetime
 import threading
+import time
+from collections import OrderedDict, deque
 from tkinter import messagebox, scrolledtext
 
+from background_tasks import BackgroundTasks
+from iclass_core import JSON_BACKEND, SCHEDULE_FORMAT_ERRORS, courses_from, schedule_fingerprint
+from metrics import RequestMetrics
+from schedule_cache import DATA_DIR, ScheduleCache
+from semester_index import SemesterIndex
+from settings import SessionStore, load_settings, rate_limit_overrides, save_settings
+from sign_journal import SignJournal
+from sign_pipeline import stream_sign
+
 
 # --- 文本截断辅助函数 ---
 def truncate_text(text, max_length):
@@ -18,32 +30,25 @@ def truncate_text(text, max_length):
     return text
 
 
-# --- 课程卡片UI组件 (最终设计) ---
+# --- 文本为空时不显示的 ToolTip，便于随卡片复用 ---
+class OptionalToolTip(ToolTip):
+    def show_tip(self, *args):
+        if self.text: super().show_tip(*args)
+
+
+# --- 课程卡片UI组件 (可复用) ---
 class CourseCard(ttk.Labelframe):
     """
-    最终版课程卡片：
-    - 修复了重复图标的BUG。
+    可复用的课程卡片：
+    - 子控件与 ToolTip 只创建一次，切换周时通过 bind_course 换绑课程数据和打卡命令，不再销毁重建。
     - 课程标题居中，详细信息左对齐，排版更专业。
-    - ToolTip功能完全可用。
+    - 文本被截断时悬浮显示完整内容。
     """
 
-    def __init__(self, parent, course_data, sign_command, **kwargs):
-        course_name = course_data.get('courseName', '未知课程')
-        truncated_name = truncate_text(course_name, 15)
-
+    def __init__(self, parent, course_data=None, sign_command=None, **kwargs):
         # 使用 ttk.Labelframe 实现类似圆角和带标题的边框效果
-        super().__init__(parent, text=f" {truncated_name} ", bootstyle="primary", padding=15, **kwargs)
-
-        # 为卡片标题添加悬浮提示
-        if course_name != truncated_name:
-            ToolTip(self, text=course_name, bootstyle="light-inverse", delay=500)
-
-        location = course_data.get('classroomName', '未知地点')
-        teacher = course_data.get('teacherName', '未知教师')
-        class_begin = course_data['classBeginTime'][11:16]
-        class_end = course_data['classEndTime'][11:16]
-        truncated_loc = truncate_text(location, 14)
-        truncated_teacher = truncate_text(teacher, 10)
+        super().__init__(parent, text="", bootstyle="primary", padding=15, **kwargs)
+        self.title_tip = OptionalToolTip(self, text=None, bootstyle="light-inverse", delay=500)
 
         # --- 内部细节布局 ---
         # 详细信息左对齐，更易阅读
@@ -52,31 +57,135 @@ class CourseCard(ttk.Labelframe):
         details_frame.columnconfigure(1, weight=1)
 
         # 时间 (一行搞定，避免重复图标)
-        time_label = ttk.Label(details_frame, text=f"🕒 {class_begin} - {class_end}", font=("微软雅黑", 10))
-        time_label.grid(row=0, column=0, columnspan=2, sticky='w')
+        self.time_label = ttk.Label(details_frame, font=("微软雅黑", 10))
+        self.time_label.grid(row=0, column=0, columnspan=2, sticky='w')
 
         # 地点
-        loc_label = ttk.Label(details_frame, text=f"📍 {truncated_loc}", font=("微软雅黑", 10))
-        loc_label.grid(row=1, column=0, columnspan=2, sticky='w', pady=(8, 0))
-        if location != truncated_loc:
-            ToolTip(loc_label, text=location, bootstyle="light-inverse", delay=500)
+        self.loc_label = ttk.Label(details_frame, font=("微软雅黑", 10))
+        self.loc_label.grid(row=1, column=0, columnspan=2, sticky='w', pady=(8, 0))
+        self.loc_tip = OptionalToolTip(self.loc_label, text=None, bootstyle="light-inverse", delay=500)
 
         # 教师 (修复了重复图标的问题)
-        teacher_label = ttk.Label(details_frame, text=f"👨‍ {truncated_teacher}", font=("微软雅黑", 10))
-        teacher_label.grid(row=2, column=0, columnspan=2, sticky='w', pady=(8, 0))
-        if teacher != truncated_teacher:
-            ToolTip(teacher_label, text=teacher, bootstyle="light-inverse", delay=500)
+        self.teacher_label = ttk.Label(details_frame, font=("微软雅黑", 10))
+        self.teacher_label.grid(row=2, column=0, columnspan=2, sticky='w', pady=(8, 0))
+        self.teacher_tip = OptionalToolTip(self.teacher_label, text=None, bootstyle="light-inverse", delay=500)
 
         # 打卡按钮
-        sign_btn = ttk.Button(self, text="✅ 课程打卡", bootstyle="outline-success", command=sign_command)
-        sign_btn.pack(fill=X, pady=(20, 0))
+        self.sign_btn = ttk.Button(self, text="✅ 课程打卡", bootstyle="outline-success")
+        self.sign_btn.pack(fill=X, pady=(20, 0))
+
+        if course_data is not None: self.bind_course(course_data, sign_command)
+
+    def bind_course(self, course_data, sign_command):
+        """换绑课程数据与打卡命令"""
+        course_name = course_data.name
+        location = course_data.room or '未知地点'
+        teacher = course_data.teacher or '未知教师'
+        truncated_name = truncate_text(course_name, 15)
+        truncated_loc = truncate_text(location, 14)
+        truncated_teacher = truncate_text(teacher, 10)
+
+        self.configure(text=f" {truncated_name} ")
+        self.time_label.configure(text=f"🕒 {course_data.begin:%H:%M} - {course_data.end:%H:%M}")
+        self.loc_label.configure(text=f"📍 {truncated_loc}")
+        self.teacher_label.configure(text=f"👨‍ {truncated_teacher}")
+        self.title_tip.text = course_name if course_name != truncated_name else None
+        self.loc_tip.text = location if location != truncated_loc else None
+        self.teacher_tip.text = teacher if teacher != truncated_teacher else None
+        self.sign_btn.configure(command=sign_command)
+
+
+# --- 工作线程到 Tk 主循环的事件队列 ---
+class UIDispatcher:
+    """
+    工作线程只通过本类与界面交互，从不直接调用 Tk：
+    - post(func, *args) 把界面操作放入线程安全队列，由主循环每 tick_ms 毫秒统一取出执行。
+    - set_status(text) 只记录最新的状态栏文本，每个 tick 最多应用一次。
+    - 传入 metrics (RequestMetrics) 时，每个界面操作的耗时记为 'ui'，便于和网络延迟对比。
+    """
+
+    def __init__(self, root, status_var, tick_ms=16, metrics=None):
+        self.root = root
+        self.status_var = status_var
+        self.tick_ms = tick_ms
+        self.metrics = metrics
+        self._queue = queue.SimpleQueue()
+        self._status = None
+        self._status_lock = threading.Lock()
+        self.root.after(self.tick_ms, self._drain)
+
+    def post(self, func, *args):
+        self._queue.put((func, args))
+
+    def set_status(self, text):
+        with self._status_lock: self._status = text
+
+    def _drain(self):
+        try:
+            while True:
+                func, args = self._queue.get_nowait()
+                start, ok = time.perf_counter(), True
+                try:
+                    func(*args)
+                except Exception:
+                    ok = False
+                    logging.getLogger(__name__).exception("界面更新失败")
+                if self.metrics: self.metrics.record('ui', time.perf_counter() - start, ok)
+        except queue.Empty:
+            pass
+        with self._status_lock:
+            status, self._status = self._status, None
+        if status is not None: self.status_var.set(status)
+        self.root.after(self.tick_ms, self._drain)
+
+
+# --- 将网络层的 logging 记录 (重试、熔断等) 转发到操作日志 ---
+class LogForwardHandler(logging.Handler):
+    def __init__(self, app):
+        super().__init__(level=logging.INFO)
+        self.app = app
+
+    def emit(self, record):
+        self.app.log_message(record.getMessage(), "warning" if record.levelno >= logging.WARNING else "info")
 
 
 # --- 主程序类 ---
 class CourseSignApp:
+    INDEX_BUILD_CONCURRENCY = 2  # 后台建立学期索引时的并发请求数，低于前台加载，不抢占当前周
+    FOREGROUND_WAIT_S = 5  # 前台加载进行中时，学期索引每获取一周前最多等待的秒数
+    # 后台任务共用的线程数 (见 background_tasks.BackgroundTasks)；同时发往服务器的请求另由 IClassClient.max_inflight 限制
+    BACKGROUND_WORKERS = 10
+    SIGN_WORKERS = 4  # 一键打卡时同时打卡的线程数 (请求速率仍受客户端限速器约束)
+    WEEK_CACHE_SIZE = 6  # 内存中保留的最近浏览周数
+    LOG_MAX_LINES = 2000  # 操作日志最多保留的行数，超出后丢弃最早的行
+    LOG_FILE = os.path.join(DATA_DIR, 'operation.log')  # 完整日志的滚动文件，设为 None 则不写文件
+
     def __init__(self):
-        self.userId = None
-        self.sessionId = None
+        # 网络客户端 (以及 requests) 在第一次使用时才创建，见 client 属性
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.cache = ScheduleCache()
+        self.metrics = RequestMetrics()
+        self._stats_refresh_id = None
+        self._log_pending = deque()
+        self._log_flush_scheduled = False
+        self._log_lock = threading.Lock()
+        self.file_logger = self._setup_file_logger()
+        self.tasks = BackgroundTasks(self.BACKGROUND_WORKERS)
+        self._week_load = None  # 最近一次周课表加载的进度 {week, results, remaining}
+        self._week_load_lock = threading.Lock()
+        self.semester_index = None  # 登录后在后台建立的学期课表索引
+        self._index_build_pending = False  # 登录后等第一次前台周加载完成再开始建立索引
+        self._foreground_idle = threading.Event()  # 没有前台周加载在进行时置位，学期索引的建立据此让路
+        self._foreground_idle.set()
+        # 最近浏览周的 LRU: 周数 -> 七天的课程列表，前后周由后台预取
+        self._week_cache = OrderedDict()
+        self._week_cache_lock = threading.Lock()
+        self._prefetching = set()
+        # 当前显示的周数与每一列课表的指纹，重新加载同一周时只重建指纹变化的列
+        self._displayed_week = None
+        self._displayed = [None] * 7
+        self._render_changes = 0  # 本次加载中重新渲染的列数，只在主线程读写
         self.semester_start = datetime.datetime(2025, 9, 1)
         self.mouse_on_canvas = False  # 用于修复滚动BUG的标志位
 
@@ -85,6 +194,57 @@ class CourseSignApp:
                                resizable=(True, True))
         self.root.minsize(1200, 750)
         self.setup_ui()
+        logging.getLogger().setLevel(logging.INFO)
+        logging.getLogger().addHandler(LogForwardHandler(self))
+        self.restore_last_session()
+
+    def restore_last_session(self):
+        """
+        用上次登录的学号立即显示本地缓存中的当前周课表 (标记为缓存数据，不访问网络)，
+        然后在后台自动登录；登录后重新加载同一周，只有变化的日期会被重新渲染。
+        """
+        settings = load_settings()
+        if not settings.get('student_id'): return
+        if settings.get('semester_start'):
+            try:
+                semester_start = datetime.datetime.strptime(str(settings['semester_start']), '%Y-%m-%d')
+            except ValueError:
+                return  # 设置文件被手工改坏时不恢复，与 load_settings 处理损坏文件的方式一致
+            self.year_var.set(str(semester_start.year))
+            self.month_var.set(str(semester_start.month)); self.day_var.set(str(semester_start.day))
+        self.student_id_var.set(str(settings['student_id']))
+        self.semester_start = self.get_semester_start_date()
+        week_number = self.get_current_week()
+        week_dates = self.calculate_week_dates(week_number)
+        try:
+            cached = [self.cache.peek(settings['user_id'], date.strftime('%Y%m%d')) if settings.get('user_id')
+                      else None for date in week_dates]
+        except ValueError:
+            cached = []  # 缓存内容无法解析时不显示，登录后重新获取
+        if any(cached):
+            self.week_var.set(f"第 {week_number} 周")
+            self._begin_week_display(week_number, week_dates)
+            try:
+                for day_idx, entry in enumerate(cached):
+                    if entry: self.display_day_courses(day_idx, courses_from(entry[1]) or [])
+            except SCHEDULE_FORMAT_ERRORS:
+                self._clear_course_display()  # 缓存内容无法解析时不显示，等待登录后重新获取
+            else:
+                fetched_at = datetime.datetime.fromtimestamp(min(entry[0] for entry in cached if entry))
+                self.login_status.config(text="🟠 缓存数据", bootstyle=WARNING)
+                self.ui.set_status(f"📦 第 {week_number} 周课表来自本地缓存 ({fetched_at:%m-%d %H:%M} 获取)，"
+                                   f"正在登录并更新...")
+        self.login()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                from iclass_client import IClassClient
+                self._client = IClassClient(cache=self.cache, journal=SignJournal(), metrics=self.metrics,
+                                            session_store=SessionStore(),
+                                            rate_limits=rate_limit_overrides(load_settings()))
+            return self._client
 
     def setup_ui(self):
         main_frame = ttk.Frame(self.root, padding=25)
@@ -108,6 +268,7 @@ class CourseSignApp:
         self.status_var = tk.StringVar(value="👋 欢迎使用北航课程打卡系统")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=SUNKEN, anchor=W, font=("微软雅黑", 10))
         status_bar.pack(side=BOTTOM, fill=X, pady=(15, 0))
+        self.ui = UIDispatcher(self.root, self.status_var, metrics=self.metrics)
 
     def setup_control_panel(self, parent):
         ttk.Label(parent, text="学号:", font=("微软雅黑", 12, "bold")).pack(anchor=W, pady=(0, 5))
@@ -147,8 +308,8 @@ class CourseSignApp:
         ttk.Button(nav_frame, text="下一周 ▶", command=self.next_week, bootstyle="outline-primary").pack(side=RIGHT,
                                                                                                          fill=X,
                                                                                                          expand=True)
-        ttk.Button(parent, text="🔄 刷新课表", command=self.load_week_courses, bootstyle="info").pack(fill=X,
-                                                                                                     pady=(0, 20))
+        ttk.Button(parent, text="🔄 刷新课表", command=self.refresh_week_courses, bootstyle="info").pack(fill=X,
+                                                                                                        pady=(0, 20))
         ttk.Separator(parent).pack(fill=X, pady=(0, 20))
         ttk.Label(parent, text="快速操作:", font=("微软雅黑", 12, "bold")).pack(anchor=W, pady=(0, 10))
         ttk.Button(parent, text="📅 跳转到当前周", command=self.jump_to_current_week, bootstyle="outline-info").pack(
@@ -165,6 +326,11 @@ class CourseSignApp:
         log_frame = ttk.Frame(notebook, padding=10)
         notebook.add(log_frame, text="  📝 操作日志  ")
         self.setup_log_view(log_frame)
+        # 性能统计页在第一次切换过去时才创建，并且只在可见时刷新
+        self.stats_frame = ttk.Frame(notebook, padding=10)
+        notebook.add(self.stats_frame, text="  📊 性能统计  ")
+        self.stats_tree = None
+        notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
     def setup_week_view(self, parent):
         self.day_headers_frame = ttk.Frame(parent)
@@ -181,12 +347,19 @@ class CourseSignApp:
         self.course_canvas.pack(side=LEFT, fill=BOTH, expand=True)
         self.course_container = ttk.Frame(self.course_canvas)
         self.container_id = self.course_canvas.create_window((0, 0), window=self.course_container, anchor="nw")
-        self.day_frames = []
+        # 内容实际尺寸变化时才重新计算滚动区域
+        self.course_container.bind("<Configure>", lambda e: self.course_canvas.configure(
+            scrollregion=self.course_canvas.bbox("all")))
+        # 每列的卡片池与"无课程"标签只创建一次，切换周时隐藏/换绑而不是销毁重建
+        self.day_frames, self.day_cards, self.empty_labels, self.day_header_cards = [], [], [], []
         for i in range(7):
             self.course_container.grid_columnconfigure(i, weight=1, uniform="day_cols")
             day_inner_frame = ttk.Frame(self.course_container)
             day_inner_frame.grid(row=0, column=i, sticky="nsew", padx=5, pady=5)
             self.day_frames.append(day_inner_frame)
+            self.day_cards.append([])
+            self.empty_labels.append(ttk.Label(day_inner_frame, text="🎉\n无课程安排", bootstyle="secondary",
+                                               font=("微软雅黑", 10), justify=CENTER))
         self.course_canvas.bind("<Configure>", self._on_canvas_configure)
         # 核心BUG修复: 使用Enter和Leave事件代替winfo_containing
         self.course_canvas.bind("<Enter>", self._on_canvas_enter)
@@ -208,24 +381,90 @@ class CourseSignApp:
             self.course_canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
 
     # ... (后续所有逻辑函数完全不变) ...
+    LOG_ICONS = {"success": "✅", "error": "❌", "warning": "⚠️", "info": "ℹ️"}
+    LOG_COLORS = {"success": "#28a745", "error": "#dc3545", "warning": "#ffc107", "info": "#17a2b8"}
+    LOG_LEVELS = {"error": logging.ERROR, "warning": logging.WARNING}
+
     def setup_log_view(self, parent):
         self.log_text = scrolledtext.ScrolledText(parent, wrap=WORD, font=("Consolas", 10), relief=FLAT, bd=5)
         self.log_text.pack(fill=BOTH, expand=True)
+        # 每种消息类型一个固定的 tag，不再为每条消息新建
+        for message_type, color in self.LOG_COLORS.items():
+            self.log_text.tag_config(f"log_{message_type}", foreground=color)
         self.log_text.config(state=DISABLED)
 
-    def log_message(self, message, message_type="info"):
-        self.root.after(0, self._log_message_ui, message, message_type)
+    STATS_REFRESH_MS = 1000  # 性能统计页的刷新间隔
+    STATS_COLUMNS = (("endpoint", "接口", 120), ("count", "请求数", 90), ("error_rate", "错误率", 90),
+                     ("p50", "p50 (ms)", 100), ("p95", "p95 (ms)", 100), ("p99", "p99 (ms)", 100),
+                     ("wait", "限速等待 (s)", 110), ("kbytes", "响应 (KB)", 100))
+
+    def setup_stats_view(self, parent):
+        ttk.Label(parent, text="login / schedule / sign 为服务器接口，ui 为界面更新耗时；限速等待为请求在本地限速器上排队的总时间",
+                  bootstyle="secondary", font=("微软雅黑", 10)).pack(anchor=W, pady=(0, 10))
+        self.stats_tree = ttk.Treeview(parent, columns=[c[0] for c in self.STATS_COLUMNS], show="headings", height=6,
+                                       bootstyle="primary")
+        for column, heading, width in self.STATS_COLUMNS:
+            self.stats_tree.heading(column, text=heading)
+            self.stats_tree.column(column, width=width, anchor=W if column == "endpoint" else E)
+        self.stats_tree.pack(fill=X)
+        self.cache_stats_var = tk.StringVar(value="")
+        ttk.Label(parent, textvariable=self.cache_stats_var, font=("微软雅黑", 11)).pack(anchor=W, pady=(15, 0))
+
+    def _on_tab_changed(self, event):
+        if self._stats_refresh_id: self.root.after_cancel(self._stats_refresh_id); self._stats_refresh_id = None
+        if event.widget.select() != str(self.stats_frame): return
+        if self.stats_tree is None: self.setup_stats_view(self.stats_frame)
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        # 行以接口名为 iid 原地更新，不重建
+        for endpoint, s in self.metrics.snapshot().items():
+            values = (endpoint, s['count'], f"{s['error_rate']:.1%}", f"{s['p50'] * 1000:.0f}",
+                      f"{s['p95'] * 1000:.0f}", f"{s['p99'] * 1000:.0f}", f"{s['wait']:.2f}",
+                      f"{s['bytes'] / 1024:.1f}")
+            if self.stats_tree.exists(endpoint): self.stats_tree.item(endpoint, values=values)
+            else: self.stats_tree.insert("", END, iid=endpoint, values=values)
+        self.cache_stats_var.set(f"{self.cache.stats_text()}    JSON 解析: {JSON_BACKEND}")
+        self._stats_refresh_id = self.root.after(self.STATS_REFRESH_MS, self.refresh_stats)
+
+    def _setup_file_logger(self):
+        if not self.LOG_FILE: return None
+        try:
+            os.makedirs(os.path.dirname(self.LOG_FILE), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(self.LOG_FILE, maxBytes=1024 * 1024, backupCount=3,
+                                                           encoding="utf-8")
+        except OSError:
+            return None
+        handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+        file_logger = logging.getLogger("ClassSignToolGUI.operation")
+        file_logger.setLevel(logging.INFO)
+        file_logger.propagate = False  # 不再经过根 logger，避免被转发回操作日志
+        file_logger.addHandler(handler)
+        return file_logger
 
-    def _log_message_ui(self, message, message_type):
-        self.log_text.config(state=NORMAL)
-        icons = {"success": "✅", "error": "❌", "warning": "⚠️", "info": "ℹ️"}
-        colors = {"success": "#28a745", "error": "#dc3545", "warning": "#ffc107", "info": "#17a2b8"}
-        icon, color = icons.get(message_type, "ℹ️"), colors.get(message_type, "#17a2b8")
+    def log_message(self, message, message_type="info"):
+        """可在任意线程调用：消息先进入队列，同一 tick 内的消息由主线程一次性插入"""
+        if self.file_logger: self.file_logger.log(self.LOG_LEVELS.get(message_type, logging.INFO), message)
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        tag_name = f"tag_{message_type}_{int(time.time() * 1000)}"
-        self.log_text.tag_config(tag_name, foreground=color)
-        self.log_text.insert(END, f"[{timestamp}] {icon} ", f"tag_icon_{message_type}")
-        self.log_text.insert(END, f"{message}\n", tag_name)
+        with self._log_lock:
+            self._log_pending.append((timestamp, message, message_type))
+            if self._log_flush_scheduled: return
+            self._log_flush_scheduled = True
+        self.ui.post(self._flush_log)
+
+    def _flush_log(self):
+        with self._log_lock:
+            pending, self._log_pending = self._log_pending, deque()
+            self._log_flush_scheduled = False
+        chunks = []
+        for timestamp, message, message_type in pending:
+            if message_type not in self.LOG_COLORS: message_type = "info"
+            chunks += [f"[{timestamp}] {self.LOG_ICONS[message_type]} ", "", f"{message}\n", f"log_{message_type}"]
+        self.log_text.config(state=NORMAL)
+        self.log_text.insert(END, *chunks)
+        # 环形缓冲: 只保留最近 LOG_MAX_LINES 行
+        excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - self.LOG_MAX_LINES
+        if excess > 0: self.log_text.delete("1.0", f"{excess + 1}.0")
         self.log_text.see(END);
         self.log_text.config(state=DISABLED)
 
@@ -246,39 +485,47 @@ class CourseSignApp:
             return datetime.datetime(2025, 9, 1)
 
     def login(self):
-        if self.validate_input(): threading.Thread(target=self._execute_login, daemon=True).start()
+        if self.validate_input():
+            self.tasks.submit(self._execute_login, self.student_id_var.get().strip(), self.get_semester_start_date())
 
-    def _execute_login(self):
-        self.status_var.set("🔄 正在登录...");
-        self.root.after(0, lambda: self.login_status.config(text="🟡 登录中...", bootstyle=WARNING))
+    def _execute_login(self, student_id, semester_start):
+        from iclass_client import NetworkError  # 与 client 属性一样在后台线程中导入网络层
+        self.ui.set_status("🔄 正在登录...");
+        self.ui.post(lambda: self.login_status.config(text="🟡 登录中...", bootstyle=WARNING))
         try:
-            student_id = self.student_id_var.get().strip()
-            url, params = 'https://iclass.buaa.edu.cn:8346/app/user/login.action', {'password': '', 'phone': student_id,
-                                                                                    'userLevel': '1',
-                                                                                    'verificationType': '2',
-                                                                                    'verificationUrl': ''}
-            res = requests.get(url=url, params=params, timeout=10)
-            userData = res.json()
+            # 有保存的会话时直接复用，不发送登录请求；会话失效时客户端会自动重新登录
+            resumed = self.client.resume(student_id)
+            userData = {'STATUS': '0'} if resumed else self.client.login(student_id)
             if userData.get('STATUS') != '0':
                 error_msg = userData.get('ERRORMSG', '未知错误');
                 self.log_message(f"登录失败: {error_msg}", "error")
-                self.root.after(0, lambda: self.login_status.config(text="🔴 登录失败", bootstyle=DANGER));
-                self.status_var.set(f"❌ 登录失败: {error_msg}");
+                self.ui.post(lambda: self.login_status.config(text="🔴 登录失败", bootstyle=DANGER));
+                self.ui.set_status(f"❌ 登录失败: {error_msg}");
                 return
-            self.userId, self.sessionId = userData['result']['id'], userData['result']['sessionId']
-            self.semester_start = self.get_semester_start_date()
-            self.log_message(f"登录成功! 用户ID: {self.userId}", "success")
-            self.root.after(0, lambda: self.login_status.config(text="🟢 已登录", bootstyle=SUCCESS));
-            self.status_var.set("✅ 登录成功，正在加载课表...")
-            self.root.after(100, self.jump_to_current_week)
-        except requests.exceptions.RequestException as e:
+            self.semester_start = semester_start
+            self.clear_week_cache()  # 学期开始日期可能变化，周数对应的日期随之改变
+            self.semester_index = SemesterIndex(self.client, self.semester_start, on_error=lambda date_str, msg:
+                                                self.log_message(f"获取 {date_str} 课程失败: {msg}", "error"),
+                                                on_change=self._on_schedule_change, executor=self.tasks.executor)
+            self._index_build_pending = True  # 由 jump_to_current_week 触发的周加载完成后再开始
+            self.log_message(f"登录成功! 用户ID: {self.client.userId}" + (" (复用已保存的会话)" if resumed else ""),
+                             "success")
+            try:
+                save_settings(student_id=student_id, user_id=self.client.userId,
+                              semester_start=semester_start.strftime('%Y-%m-%d'))
+            except OSError as e:
+                self.log_message(f"保存设置失败 (下次启动不会自动填入): {e}", "warning")
+            self.ui.post(lambda: self.login_status.config(text="🟢 已登录", bootstyle=SUCCESS));
+            self.ui.set_status("✅ 登录成功，正在加载课表...")
+            self.ui.post(self.jump_to_current_week)
+        except NetworkError as e:
             self.log_message(f"网络连接错误: {e}", "error");
-            self.root.after(0, lambda: self.login_status.config(text="🔴 网络错误", bootstyle=DANGER));
-            self.status_var.set("❌ 登录时网络错误")
+            self.ui.post(lambda: self.login_status.config(text="🔴 网络错误", bootstyle=DANGER));
+            self.ui.set_status("❌ 登录时网络错误")
         except Exception as e:
             self.log_message(f"登录时发生未知错误: {e}", "error");
-            self.root.after(0, lambda: self.login_status.config(text="🔴 登录错误", bootstyle=DANGER));
-            self.status_var.set("❌ 登录时发生未知错误")
+            self.ui.post(lambda: self.login_status.config(text="🔴 登录错误", bootstyle=DANGER));
+            self.ui.set_status("❌ 登录时发生未知错误")
 
     def calculate_week_dates(self, week_number):
         start_date = self.semester_start + datetime.timedelta(weeks=week_number - 1)
@@ -300,135 +547,272 @@ class CourseSignApp:
         if current_week < 18: self.week_var.set(f"第 {current_week + 1} 周"); self.load_week_courses()
 
     def load_week_courses(self):
-        if not self.userId: messagebox.showwarning("警告", "请先登录系统"); return
-        threading.Thread(target=self._execute_load_courses, daemon=True).start()
+        if not self.client.logged_in: messagebox.showwarning("警告", "请先登录系统"); return
+        token = self.cancel_week_load()
+        week_number = int(self.week_var.get().split()[1])
+        week_courses = self._week_cache_get(week_number)
+        if week_courses is not None:
+            # 最近看过的周直接从内存渲染，不再请求服务器
+            self._render_week(week_number, week_courses)
+            self.ui.set_status(f"✅ 第 {week_number} 周课表加载完成 (内存缓存)")
+            self.prefetch_adjacent_weeks(week_number)
+            return
+        self._start_week_load(token, week_number)
+
+    def refresh_week_courses(self):
+        """清除当前周的内存与本地缓存后重新加载"""
+        if not self.client.logged_in: messagebox.showwarning("警告", "请先登录系统"); return
+        week_number = int(self.week_var.get().split()[1])
+        date_strs = [date.strftime('%Y%m%d') for date in self.calculate_week_dates(week_number)]
+        with self._week_cache_lock: self._week_cache.pop(week_number, None)
+        self.semester_index.invalidate(date_strs)
+        self.cache.invalidate(self.client.userId, date_strs)
+        self.load_week_courses()
 
-    def _execute_load_courses(self):
+    def _build_semester_index(self):
+        """后台获取整个学期的课表，之后的周视图与一键打卡只需刷新过期的日期"""
+        index = self.semester_index
         try:
-            week_number = int(self.week_var.get().split()[1])
-            week_dates = self.calculate_week_dates(week_number)
-            self.status_var.set(f"🔄 正在加载第 {week_number} 周课表...");
-            self.log_message(f"开始加载第 {week_number} 周课表", "info")
-            self.root.after(0, self._clear_course_display)
-            self.root.after(0, lambda: self._update_week_headers(week_dates))
-            for day_idx, date in enumerate(week_dates): self.fetch_day_courses(day_idx, date.strftime('%Y%m%d'))
-            self.status_var.set(f"✅ 第 {week_number} 周课表加载完成");
-            self.log_message(f"第 {week_number} 周课表加载完成", "success")
-            self.root.after(100, lambda: self.course_canvas.configure(scrollregion=self.course_canvas.bbox("all")))
+            with self.client.background():
+                days = index.build(self.INDEX_BUILD_CONCURRENCY,
+                                   before_week=lambda: self._foreground_idle.wait(self.FOREGROUND_WAIT_S))
+            loaded = sum(1 for _, courses in days if courses is not None)
+            self.log_message(f"学期课表索引已建立: {loaded}/{len(days)} 天, {len(index.course_names())} 门课程", "info")
         except Exception as e:
-            self.log_message(f"加载课表时发生错误: {e}", "error");
-            self.status_var.set("❌ 课表加载失败")
+            self.log_message(f"建立学期课表索引失败: {e}", "warning")
+
+    def _week_cache_get(self, week_number):
+        with self._week_cache_lock:
+            if week_number not in self._week_cache: return None
+            self._week_cache.move_to_end(week_number)
+            return self._week_cache[week_number]
+
+    def _week_cache_put(self, week_number, week_courses):
+        with self._week_cache_lock:
+            self._week_cache[week_number] = week_courses
+            self._week_cache.move_to_end(week_number)
+            while len(self._week_cache) > self.WEEK_CACHE_SIZE: self._week_cache.popitem(last=False)
+
+    def _on_schedule_change(self, date_str, courses):
+        """学期索引中某天的课表有变化时，丢弃内存中包含这一天的周，下次查看时使用新数据"""
+        week_number = (datetime.datetime.strptime(date_str, '%Y%m%d') - self.semester_start).days // 7 + 1
+        with self._week_cache_lock: self._week_cache.pop(week_number, None)
+
+    def clear_week_cache(self):
+        with self._week_cache_lock: self._week_cache.clear()
+
+    def prefetch_adjacent_weeks(self, week_number):
+        """后台预取前一周和后一周，切换周时可直接从内存渲染"""
+        for week in (week_number - 1, week_number + 1):
+            with self._week_cache_lock:
+                if not 1 <= week <= 18 or week in self._week_cache or week in self._prefetching: continue
+                self._prefetching.add(week)
+            self.tasks.spawn(self._prefetch_week, week)
+
+    def _prefetch_week(self, week_number):
+        try:
+            with self.client.background():
+                week_courses = [courses for _, courses in self.semester_index.week(week_number)]
+            if None not in week_courses: self._week_cache_put(week_number, week_courses)
+        except Exception as e:
+            self.log_message(f"预取第 {week_number} 周课表失败: {e}", "warning")
+        finally:
+            with self._week_cache_lock: self._prefetching.discard(week_number)
+
+    def _render_week(self, week_number, week_courses):
+        self._begin_week_display(week_number, self.calculate_week_dates(week_number))
+        for day_idx, courses in enumerate(week_courses): self.display_day_courses(day_idx, courses)
+
+    def _begin_week_display(self, week_number, week_dates):
+        """切换到另一周时清空各列；仍是当前显示的周时保留内容，由 display_day_courses 只更新变化的列"""
+        if week_number != self._displayed_week: self._clear_course_display()
+        self._displayed_week = week_number
+        self._render_changes = 0
+        self._update_week_headers(week_dates)
+
+    def cancel_week_load(self):
+        """
+        开始新一代周课表加载，之前的加载随之过期：还在排队的日期不再请求服务器，已返回的结果不再渲染。
+        返回新一代的令牌。
+        """
+        with self._week_load_lock:
+            load, self._week_load = self._week_load, None
+        if load and load['remaining']: self.log_message(f"第 {load['week']} 周课表加载已取消", "warning")
+        self._foreground_idle.set()
+        return self.tasks.new_generation('week')
+
+    def _start_week_load(self, token, week_number):
+        """七天各作为一个后台任务获取，哪天先返回就先渲染哪一列；最后返回的一天负责收尾"""
+        week_dates = self.calculate_week_dates(week_number)
+        self.ui.set_status(f"🔄 正在加载第 {week_number} 周课表...")
+        self.log_message(f"开始加载第 {week_number} 周课表", "info")
+        self._begin_week_display(week_number, week_dates)
+        with self._week_load_lock:
+            self._week_load = load = {'week': week_number, 'results': [None] * 7, 'remaining': 7}
+        self._foreground_idle.clear()
+        for day_idx, date in enumerate(week_dates):
+            self.tasks.submit(self._load_day, token, load, day_idx, date.strftime('%Y%m%d'), token=token)
+
+    def _load_day(self, token, load, day_idx, date_str):
+        courses = self.fetch_day_courses(day_idx, date_str, token)
+        with self._week_load_lock:
+            load['results'][day_idx] = courses
+            load['remaining'] -= 1
+            finished = load['remaining'] == 0
+        if finished and not token.stale: self._finish_week_load(load['week'], load['results'])
+
+    def _finish_week_load(self, week_number, week_courses):
+        self._foreground_idle.set()
+        if None not in week_courses: self._week_cache_put(week_number, week_courses)
+        if self._index_build_pending:
+            self._index_build_pending = False
+            self.tasks.spawn(self._build_semester_index)
+        self.prefetch_adjacent_weeks(week_number)
+        self.ui.set_status(f"✅ 第 {week_number} 周课表加载完成");
+        self.log_message(f"第 {week_number} 周课表加载完成 ({self.cache.stats_text()})", "success")
+        # 排在各列的渲染之后执行，此时计数已包含本次加载的全部列
+        self.ui.post(self._log_render_changes, week_number)
 
     def _clear_course_display(self):
-        for header in self.day_headers_frame.winfo_children(): header.destroy()
-        for day_frame in self.day_frames:
-            for widget in day_frame.winfo_children(): widget.destroy()
+        for day_idx in range(7): self._hide_day(day_idx)
+
+    def _hide_day(self, day_idx):
+        self._displayed[day_idx] = None
+        self.empty_labels[day_idx].pack_forget()
+        for card in self.day_cards[day_idx]:
+            if card.winfo_manager(): card.pack_forget()
 
     def _update_week_headers(self, week_dates):
         days = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
-        for i, date in enumerate(week_dates):
+        if not self.day_header_cards:
+            for i in range(7):
+                header_card = ttk.Frame(self.day_headers_frame, padding=8, relief="raised", borderwidth=1)
+                header_card.grid(row=0, column=i, sticky="ew", padx=5)
+                day_label = ttk.Label(header_card, text=days[i], font=("微软雅黑", 12, "bold"))
+                day_label.pack()
+                date_label = ttk.Label(header_card, font=("微软雅黑", 9))
+                date_label.pack()
+                self.day_header_cards.append((header_card, day_label, date_label))
+        # 表头原地更新日期与"今天"高亮
+        for (header_card, day_label, date_label), date in zip(self.day_header_cards, week_dates):
             is_today = date.date() == datetime.date.today()
             header_style, text_style = ("primary", "inverse-primary") if is_today else ("light", "dark")
-            header_card = ttk.Frame(self.day_headers_frame, padding=8, bootstyle=header_style, relief="raised",
-                                    borderwidth=1)
-            header_card.grid(row=0, column=i, sticky="ew", padx=5)
-            ttk.Label(header_card, text=days[i], font=("微软雅黑", 12, "bold"), bootstyle=text_style).pack()
-            ttk.Label(header_card, text=date.strftime("%m-%d"), font=("微软雅黑", 9), bootstyle=text_style).pack()
+            header_card.configure(bootstyle=header_style)
+            day_label.configure(bootstyle=text_style)
+            date_label.configure(text=date.strftime("%m-%d"), bootstyle=text_style)
 
-    def fetch_day_courses(self, day_idx, date_str):
+    def fetch_day_courses(self, day_idx, date_str, token=None):
         try:
-            json_data = self.get_course_schedule(date_str)
-            courses = json_data.get('result', []) if json_data and json_data.get('STATUS') == '0' else []
-            self.root.after(0, lambda: self.display_day_courses(day_idx, courses))
+            if token and token.stale: return None
+            courses = self.semester_index.day(date_str)
+            # 获取失败时保留该列原有的显示 (例如离线时的缓存数据)
+            if courses is None: return None
+            # 渲染前再检查一次，过期的加载不能覆盖新一周的显示
+            self.ui.post(lambda: None if token and token.stale else self.display_day_courses(day_idx, courses))
+            return courses
         except Exception as e:
             self.log_message(f"获取 {date_str} 课程时发生错误: {e}", "error")
 
-    def get_course_schedule(self, dateStr):
-        try:
-            url, params, headers = f'https://iclass.buaa.edu.cn:8346/app/course/get_stu_course_sched.action', {
-                'dateStr': dateStr, 'id': self.userId}, {'sessionId': self.sessionId}
-            res = requests.get(url, params=params, headers=headers, timeout=10)
-            return res.json() if res.status_code == 200 else None
-        except requests.exceptions.RequestException as e:
-            self.log_message(f"网络请求失败: {e}", "error");
-            return None
+    def _log_render_changes(self, week_number):
+        changed = self._render_changes
+        self.log_message(f"第 {week_number} 周: " + (f"{changed} 天有变化，已重新渲染" if changed else "课表无变化"), "info")
 
     def display_day_courses(self, day_idx, courses):
-        day_frame = self.day_frames[day_idx]
+        """显示一天的课程，返回是否重新渲染；课表指纹与正在显示的相同时不重建该列"""
+        fingerprint = schedule_fingerprint(courses)
+        if fingerprint == self._displayed[day_idx]: return False
+        day_frame, cards = self.day_frames[day_idx], self.day_cards[day_idx]
+        self._hide_day(day_idx)
+        self._displayed[day_idx] = fingerprint
+        self._render_changes += 1
         if not courses:
-            ttk.Label(day_frame, text="🎉\n无课程安排", bootstyle="secondary", font=("微软雅黑", 10),
-                      justify=CENTER).pack(pady=50, fill=X)
-            return
-        for course in courses:
-            CourseCard(day_frame, course,
-                       lambda cid=course['id'], name=course['courseName']: self.sign_course(cid, name)).pack(fill=X,
-                                                                                                             pady=5)
+            self.empty_labels[day_idx].pack(pady=50, fill=X)
+            return True
+        for i, course in enumerate(courses):
+            # 卡片池不够时才新建，多余的卡片保持隐藏以备下次复用
+            if i == len(cards): cards.append(CourseCard(day_frame))
+            cards[i].bind_course(course, lambda cid=course.id, name=course.name: self.sign_course(cid, name))
+            cards[i].pack(fill=X, pady=5)
+        return True
 
     def sign_course(self, course_sched_id, course_name):
-        threading.Thread(target=self._execute_sign, args=(course_sched_id, course_name), daemon=True).start()
+        self.tasks.submit(self._execute_sign, course_sched_id, course_name)
 
     def _execute_sign(self, course_sched_id, course_name):
-        self.status_var.set(f"🔄 正在为 {course_name} 打卡...");
+        self.ui.set_status(f"🔄 正在为 {course_name} 打卡...");
         self.log_message(f"开始打卡: {course_name}", "info")
         try:
             if self.sign_course_request(course_sched_id):
                 self.log_message(f"打卡成功: {course_name}", "success");
-                self.status_var.set(f"✅ 打卡成功: {course_name}")
-                self.root.after(0, lambda: messagebox.showinfo("成功", f"{course_name} 打卡成功！"))
+                self.ui.set_status(f"✅ 打卡成功: {course_name}")
+                self.ui.post(messagebox.showinfo, "成功", f"{course_name} 打卡成功！")
             else:
                 self.log_message(f"打卡失败: {course_name}", "error");
-                self.status_var.set(f"❌ 打卡失败: {course_name}")
-                self.root.after(0, lambda: messagebox.showerror("错误",
-                                                                f"{course_name} 打卡失败！\n可能是重复打卡或不在有效时间内。"))
+                self.ui.set_status(f"❌ 打卡失败: {course_name}")
+                self.ui.post(messagebox.showerror, "错误", f"{course_name} 打卡失败！\n可能是重复打卡或不在有效时间内。")
         except Exception as e:
             self.log_message(f"打卡过程发生错误: {e}", "error");
-            self.status_var.set("❌ 打卡过程出错")
-            self.root.after(0, lambda: messagebox.showerror("错误", f"打卡过程发生错误: {e}"))
+            self.ui.set_status("❌ 打卡过程出错")
+            self.ui.post(messagebox.showerror, "错误", f"打卡过程发生错误: {e}")
 
     def batch_sign_week(self):
-        if not self.userId: messagebox.showwarning("警告", "请先登录系统"); return
-        threading.Thread(target=self._execute_batch_sign, daemon=True).start()
+        if not self.client.logged_in: messagebox.showwarning("警告", "请先登录系统"); return
+        self.tasks.spawn(self._execute_batch_sign, int(self.week_var.get().split()[1]))
 
-    def _execute_batch_sign(self):
+    def _execute_batch_sign(self, week_number):
         try:
-            week_number = int(self.week_var.get().split()[1])
-            self.status_var.set(f"🔄 正在一键打卡第 {week_number} 周...");
+            self.ui.set_status(f"🔄 正在一键打卡第 {week_number} 周...");
             self.log_message(f"开始一键打卡第 {week_number} 周所有课程", "info")
-            all_courses = [course for date in self.calculate_week_dates(week_number) for course in
-                           (self.get_course_schedule(date.strftime('%Y%m%d')) or {}).get('result', [])]
-            total, success = len(all_courses), 0
-            for i, course in enumerate(all_courses):
-                self.status_var.set(f"🔄 ({i + 1}/{total}): {truncate_text(course['courseName'], 20)}")
-                if self.sign_course_request(course['id']):
-                    self.log_message(f"打卡成功: {course['courseName']}", "success"); success += 1
-                else:
-                    self.log_message(f"打卡失败: {course['courseName']} (可能已打卡)", "warning")
-                time.sleep(0.2)
-            summary = f"一键打卡完成: 成功 {success} / {total} 门课程"
-            self.status_var.set(f"✅ {summary}");
-            self.log_message(summary, "success" if success == total else "warning")
-            self.root.after(0, lambda: messagebox.showinfo("完成", summary))
+            progress = {'done': 0, 'queued': 0}
+            progress_lock = threading.Lock()
+
+            def on_day(date_str, courses):
+                with progress_lock: progress['queued'] += len(courses or [])
+                if courses is None: self.log_message(f"获取 {date_str} 课程失败，该天的课程未打卡", "warning")
+
+            def on_sign(course, ok, skipped, error):
+                with progress_lock: progress['done'] += 1; done, queued = progress['done'], progress['queued']
+                self.ui.set_status(f"🔄 ({done}/{queued}): {truncate_text(course.name, 20)}")
+                if skipped: return
+                if ok: self.log_message(f"打卡成功: {course.name}", "success")
+                else: self.log_message(f"打卡失败: {course.name} ({error or '可能已打卡'})", "warning")
+
+            # 每天的课表一返回就开始打卡，获取与打卡同时进行；打卡记录中已确认成功的课程直接跳过
+            index, client = self.semester_index, self.client
+            summary = stream_sign(index, index.week_dates(week_number), client.sign_course, is_signed=client.is_signed,
+                                  sign_workers=self.SIGN_WORKERS, on_day=on_day, on_sign=on_sign,
+                                  executor=self.tasks.executor)
+            success, skipped = summary['signed'], summary['skipped']
+            total = success + summary['sign_failed']
+            if skipped: self.log_message(f"跳过 {skipped} 门已打卡的课程", "info")
+            failed_days = summary['failed_days']
+            summary_text = (f"一键打卡完成: 成功 {success} / {total} 门课程" + (f"，跳过已打卡 {skipped} 门" if skipped else "")
+                            + (f"，{failed_days} 天课表获取失败" if failed_days else ""))
+            self.ui.set_status(f"✅ {summary_text}");
+            self.log_message(summary_text, "success" if success == total and not failed_days else "warning")
+            self.ui.post(messagebox.showinfo, "完成", summary_text)
         except Exception as e:
             self.log_message(f"一键打卡时发生错误: {e}", "error");
-            self.status_var.set("❌ 一键打卡失败")
+            self.ui.set_status("❌ 一键打卡失败")
 
     def sign_course_request(self, courseSchedId):
+        from iclass_client import NetworkError
         try:
-            params, url = {
-                'id': self.userId}, f'http://iclass.buaa.edu.cn:8081/app/course/stu_scan_sign.action?courseSchedId={courseSchedId}&timestamp={int(time.time() * 1000)}'
-            r = requests.post(url, params=params, timeout=10)
-            if r.status_code == 200:
-                try:
-                    return r.json().get('STATUS') == '0'
-                except json.JSONDecodeError:
-                    return '成功' in r.text or 'SUCCESS' in r.text
-            return False
-        except requests.exceptions.RequestException as e:
+            return self.client.sign_course(courseSchedId)
+        except NetworkError as e:
             self.log_message(f"打卡网络请求失败: {e}", "error");
             return False
 
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.tasks.shutdown()  # 丢弃还在排队的后台任务
+            # 关闭客户端：正在退避的重试立即结束、不再发出新请求，进程只需等在途请求返回即可退出；
+            # 同时关闭课程表缓存与打卡记录 (没有登录过时只有缓存需要关闭)
+            with self._client_lock:
+                if self._client: self._client.close()
+                else: self.cache.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundTasks:
+    """
+    GUI 全部后台工作共用的两个有界线程池，不再每次操作新开线程：
+    - executor (max_workers 个线程) 执行不会等待其他任务的工作：单日课表获取、登录、单次打卡等。
+      SemesterIndex.ensure / IClassClient.fetch_schedules / sign_pipeline.stream_sign 也把各自的请求提交到这里。
+    - spawn() 提交需要等待 executor 中任务的协调工作 (预取、建立学期索引、一键打卡)，在另外 max_coordinators 个
+      线程中运行；协调任务不会占满 executor，也就不会出现等待者占住全部线程、被等待的任务无法开始的死锁。
+    同一 channel 的任务按代数区分：new_generation(channel) 开始新一代并返回令牌，之前各代的令牌随之过期；
+    带过期令牌的任务还没开始就直接跳过，已在运行的任务通过 token.stale 判断并丢弃结果。
+    """
+
+    def __init__(self, max_workers, max_coordinators=4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task')
+        self._coordinators = ThreadPoolExecutor(max_workers=max_coordinators, thread_name_prefix='task-coordinator')
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def new_generation(self, channel):
+        with self._lock:
+            generation = self._generations[channel] = self._generations.get(channel, 0) + 1
+        return GenerationToken(self, channel, generation)
+
+    def is_current(self, channel, generation):
+        with self._lock:
+            return self._generations.get(channel) == generation
+
+    def submit(self, func, *args, token=None):
+        return self.executor.submit(self._skip_if_stale, token, func, args)
+
+    def spawn(self, func, *args, token=None):
+        return self._coordinators.submit(self._skip_if_stale, token, func, args)
+
+    @staticmethod
+    def _skip_if_stale(token, func, args):
+        if token and token.stale:
+            return None
+        return func(*args)
+
+    def shutdown(self):
+        """丢弃还在排队的任务，不等待正在运行的任务"""
+        self._coordinators.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class GenerationToken:
+    __slots__ = ('tasks', 'channel', 'generation')
+
+    def __init__(self, tasks, channel, generation):
+        self.tasks, self.channel, self.generation = tasks, channel, generation
+
+    @property
+    def stale(self):
+        return not self.tasks.is_current(self.channel, self.generation)
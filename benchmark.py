@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import wait
+
+import ClassSignToolCLI
+from background_tasks import BackgroundTasks
+from iclass_client import IClassClient
+from iclass_core import JSON_BACKEND
+from mock_server import MockIClassServer
+from semester_index import SemesterIndex
+from sign_pipeline import stream_sign
+
+STUDENT_ID = '20370000'
+SEMESTER_START = '20250901'  # 周一
+RANGE_DAYS = 30
+SCAN_TERM_DAYS = 28  # 模拟服务器从开学后第 28 天起没课，连续扫描在之后一周停止
+GUI_BACKGROUND_WORKERS = 10  # 与 CourseSignApp.BACKGROUND_WORKERS 一致
+GUI_SIGN_WORKERS = 4  # 与 CourseSignApp.SIGN_WORKERS 一致
+# 启动时导入的入口模块，以及它们启动时不应导入的网络层依赖 (第一次网络请求前才由 iclass_client 导入)。
+# 用 python -X importtime 检查：导入了其中任何一个时 benchmark 以退出码 1 结束。
+# 导入耗时 (毫秒) 只作记录，与机器负载有关，用 --compare 与之前的报告对比。
+STARTUP_MODULES = ('iclass_core', 'ClassSignToolCLI', 'ClassSignToolGUI')
+STARTUP_FORBIDDEN_IMPORTS = ('requests', 'urllib3', 'asyncio')
+
+
+def _date(offset):
+    start = datetime.datetime.strptime(SEMESTER_START, '%Y%m%d')
+    return (start + datetime.timedelta(days=offset)).strftime('%Y%m%d')
+
+
+def _client(server):
+    client = IClassClient(base_url=server.url, sign_base_url=server.url)
+    client.login(STUDENT_ID)
+    return client
+
+
+def bench_gui_week_load(server):
+    """GUI 加载一周课表的数据路径 (不创建窗口)：七天各作为一个 BackgroundTasks 任务获取，全部返回后结束"""
+    client = _client(server)
+    tasks = BackgroundTasks(GUI_BACKGROUND_WORKERS)
+    try:
+        index = SemesterIndex(client, datetime.datetime.strptime(SEMESTER_START, '%Y%m%d'), executor=tasks.executor)
+        token = tasks.new_generation('week')
+        for future in wait([tasks.submit(index.day, date_str, token=token) for date_str in index.week_dates(1)]).done:
+            future.result()
+    finally:
+        tasks.shutdown()
+        client.close()
+
+
+def _run_cli(server, *argv):
+    argv = [*argv, '-u', STUDENT_ID, '--list-only', '--no-cache', '--no-session-reuse', '--base-url', server.url,
+            '--sign-base-url', server.url]
+    with contextlib.redirect_stdout(io.StringIO()):
+        if ClassSignToolCLI.main(argv) != 0:
+            raise RuntimeError(f"CLI 运行失败: {' '.join(argv)}")
+
+
+def bench_cli_range(server):
+    """CLI 批处理模式获取 RANGE_DAYS 天的课程表"""
+    _run_cli(server, 'range', _date(0), _date(RANGE_DAYS - 1))
+
+
+def bench_cli_scan(server):
+    """CLI 批处理模式从开学日起连续扫描，直到连续一周没课"""
+    _run_cli(server, 'scan', _date(0))
+
+
+def bench_batch_week_sign(server):
+    """与 GUI "一键打卡本周" 相同：七天课表边获取边打卡 (sign_pipeline.stream_sign)"""
+    client = _client(server)
+    tasks = BackgroundTasks(GUI_BACKGROUND_WORKERS)
+    try:
+        index = SemesterIndex(client, datetime.datetime.strptime(SEMESTER_START, '%Y%m%d'), executor=tasks.executor)
+        stream_sign(index, index.week_dates(1), client.sign_course, sign_workers=GUI_SIGN_WORKERS,
+                    executor=tasks.executor)
+    finally:
+        tasks.shutdown()
+        client.close()
+
+
+SCENARIOS = {
+    'gui_week_load': bench_gui_week_load,
+    'cli_range': bench_cli_range,
+    'cli_scan': bench_cli_scan,
+    'batch_week_sign': bench_batch_week_sign,
+}
+
+
+def run_scenario(server, func, repeat):
+    runs, requests = [], []
+    for _ in range(repeat):
+        before = server.requests
+        start = time.perf_counter()
+        func(server)
+        runs.append(time.perf_counter() - start)
+        requests.append(server.requests - before)
+    return {
+        'runs_s': [round(run, 4) for run in runs],
+        'min_s': round(min(runs), 4),
+        'median_s': round(statistics.median(runs), 4),
+        'mean_s': round(statistics.mean(runs), 4),
+        'server_requests': round(statistics.mean(requests), 1),
+    }
+
+
+def measure_import(module, repeat):
+    """
+    在新的解释器中导入 module，返回 {ms: repeat 次中最快的累计导入耗时 (毫秒),
+    forbidden: 随之导入的 STARTUP_FORBIDDEN_IMPORTS 中的包}
+    """
+    best, imported = None, set()
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        for line in result.stderr.splitlines():
+            # 格式: "import time: self [us] | cumulative | imported package"
+            fields = line.split('|')
+            if len(fields) != 3 or not fields[1].strip().isdigit():
+                continue
+            name = fields[2].strip()
+            imported.add(name.split('.')[0])
+            if name == module:
+                cumulative = int(fields[1]) / 1000
+                best = cumulative if best is None else min(best, cumulative)
+    if best is None:
+        raise RuntimeError(f"无法导入 {module}")
+    return {'ms': round(best, 1), 'forbidden': [name for name in STARTUP_FORBIDDEN_IMPORTS if name in imported]}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """打印与基准报告相比各场景中位数耗时与导入耗时的变化"""
+    rows = [(name, result['median_s'], baseline.get('scenarios', {}).get(name, {}).get('median_s'), 's')
+            for name, result in report['scenarios'].items()]
+    rows += [(f"import {module}", result['ms'], baseline.get('imports', {}).get(module, {}).get('ms'), 'ms')
+             for module, result in report['imports'].items()]
+    print(f"{'项目':<26}{'基准':>12}{'本次':>12}{'变化':>10}")
+    for name, new, old, unit in rows:
+        change = f"{(new - old) / old:+.1%}" if old else '-'
+        old = f"{old:.3f}{unit}" if old is not None else '-'
+        print(f"{name:<28}{old:>14}{f'{new:.3f}{unit}':>14}{change:>12}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="在本地模拟服务器上测量 GUI / CLI 主要流程的耗时，结果写入 JSON 报告")
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help=f"要运行的场景，默认全部: {', '.join(SCENARIOS)}")
+    parser.add_argument('-n', '--repeat', type=int, default=3, help="每个场景重复的次数")
+    parser.add_argument('-o', '--output', default='benchmark_report.json', help="JSON 报告的路径")
+    parser.add_argument('--compare', metavar='REPORT', help="与之前的报告对比中位数耗时")
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟服务器每个请求的延迟 (秒)")
+    parser.add_argument('--jitter', type=float, default=0.01, help="延迟的随机波动范围 (秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="模拟服务器返回 HTTP 500 的概率")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="模拟服务器挂起不响应的概率")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的场景: {', '.join(unknown)}")
+    mock = {'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+            'timeout_rate': args.timeout_rate, 'empty_after': _date(SCAN_TERM_DAYS)}
+    server = MockIClassServer(**mock).start()
+    report = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'json_backend': JSON_BACKEND,
+            'repeat': args.repeat,
+            'mock': mock,
+        },
+        'imports': {},
+        'scenarios': {},
+    }
+    for module in STARTUP_MODULES:
+        report['imports'][module] = measure_import(module, max(args.repeat, 3))
+    try:
+        for name in args.scenarios or SCENARIOS:
+            print(f"运行 {name} ...", file=sys.stderr)
+            report['scenarios'][name] = run_scenario(server, SCENARIOS[name], args.repeat)
+    finally:
+        server.stop()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    forbidden = False
+    for module, result in report['imports'].items():
+        forbidden = forbidden or bool(result['forbidden'])
+        print(f"导入 {module:<18} {result['ms']:.1f}ms" +
+              (f"  ⚠ 启动时导入了 {', '.join(result['forbidden'])}" if result['forbidden'] else ""))
+    for name, result in report['scenarios'].items():
+        print(f"{name:<16} 中位数 {result['median_s']:.3f}s  最快 {result['min_s']:.3f}s  "
+              f"请求 {result['server_requests']:g} 次")
+    print(f"报告已写入 {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+    return 1 if forbidden else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import logging
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """主机处于熔断状态，请求未发出直接失败"""
+
+
+class CircuitBreaker:
+    """
+    单个主机的熔断器：
+    - closed: 正常放行，连续失败 failure_threshold 次后转为 open。
+    - open: 直接拒绝请求，reset_timeout 秒后转为 half_open。
+    - half_open: 只放行一个探测请求，成功则恢复 closed，失败则重新 open。
+    状态变化写入日志。
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half_open'
+                self._probing = False
+                logger.info("%s 熔断器进入半开状态，发送探测请求", self.name)
+            if self.state == 'half_open':
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def check(self):
+        """不允许请求时抛出 CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} 暂时不可用 (熔断中)，请稍后重试")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info("%s 已恢复，熔断器关闭", self.name)
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                logger.warning("%s 连续失败 %d 次，熔断 %d 秒", self.name, self.failures, self.reset_timeout)
@@ -0,0 +1,316 @@
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from circuit_breaker import CircuitBreaker
+from iclass_core import (DEFAULT_BASE_URL, DEFAULT_RATE_LIMITS, DEFAULT_SIGN_BASE_URL, LOGIN_PATH, SCHEDULE_PATH,
+                         SIGN_PATH, decode_json, login_params, parse_login, session_expired, sign_succeeded)
+from metrics import RequestMetrics
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# 网络层抛出的异常 (包括熔断时的 CircuitOpenError)；调用方捕获它而不是 OSError，本地文件错误不会被误报为网络错误
+NetworkError = requests.RequestException
+
+
+class ClientClosedError(requests.RequestException):
+    """客户端已关闭 (例如 GUI 窗口已关闭)，请求未发出或结果被丢弃"""
+
+# 同时在途的请求总数上限 (所有接口、所有线程合计)，无论调用方开多少线程，服务器最多同时看到这么多请求
+MAX_INFLIGHT_REQUESTS = 8
+
+# 在 IClassClient.background() 中发出的请求 (预取、建立学期索引) 为后台请求：
+# 只在令牌桶接近满时才取令牌，前台请求 (用户正在看的那一周) 始终有突发配额可用
+_background = contextvars.ContextVar('iclass_background', default=False)
+
+# 幂等的课程表读取失败时的重试: 次数与指数退避 (全抖动) 的基准/上限秒数
+SCHEDULE_RETRIES = 3
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8
+
+
+class IClassClient:
+    """
+    iClass 接口客户端，CLI 与 GUI 共用：
+    - base_url (登录/课程表) 与 sign_base_url (打卡) 默认为 DEFAULT_BASE_URL / DEFAULT_SIGN_BASE_URL。
+    - 使用 keep-alive 的 requests.Session，同一主机的请求复用已建立的 TCP/TLS 连接。
+    - 保存登录后的 userId / sessionId。
+    - 传入 cache (ScheduleCache) 时，课程表读取先查本地缓存。
+    - 传入 journal (SignJournal) 时，每次打卡的结果都会记入打卡记录，is_signed 可查询是否已打过卡。
+    - 每个接口有独立的令牌桶限速 (rate_limits，{endpoint: (rate[, burst[, max_rate]])} 覆盖 DEFAULT_RATE_LIMITS)，
+      响应良好时逐步提速到 max_rate，出错或响应变慢时自动降速；
+      另外所有接口合计同时在途的请求不超过 max_inflight 个，排队时间计入限速等待。
+      在 background() 中发出的请求优先级较低，只使用前台用剩的限速配额。
+    - 课程表读取失败时按指数退避加抖动重试；每个主机 (8346 / 8081) 一个熔断器，
+      主机不可用期间直接抛出 CircuitOpenError，不必等待超时。重试与熔断写入 logging。
+    - 设置 on_request(endpoint, params, elapsed, result) 可观察每次请求的耗时，
+      result 为 HTTP 状态码或请求异常。
+    - metrics (RequestMetrics) 统计每个接口的请求数、错误率、延迟分位数、响应字节数与限速等待时间。
+    - 响应由 decoder (默认 iclass_core.decode_json) 直接从原始字节解析；课程表缓存保存原始字节，不再重新编码。
+    - 传入 session_store (settings.SessionStore) 时，登录后保存会话，resume() 可直接复用而不发送登录请求。
+      课表接口返回会话失效时自动重新登录一次 (多个线程同时发现时只登录一次)，再重发失败的请求。
+    - 网络异常 (requests.RequestException) 与 JSON 解析异常 (ValueError) 交由调用方处理。
+    - close() 之后不再发出新请求与重试 (抛出 ClientClosedError)，正在退避等待的重试立即结束；
+      在途请求返回后结果直接丢弃，不再写入已关闭的缓存与打卡记录。
+    """
+
+    def __init__(self, pool_size=16, timeout=10, cache=None, rate_limits=None, journal=None, base_url=None,
+                 sign_base_url=None, metrics=None, decoder=None, session_store=None,
+                 max_inflight=MAX_INFLIGHT_REQUESTS):
+        self.login_url = (base_url or DEFAULT_BASE_URL).rstrip('/') + LOGIN_PATH
+        self.schedule_url = (base_url or DEFAULT_BASE_URL).rstrip('/') + SCHEDULE_PATH
+        self.sign_url = (sign_base_url or DEFAULT_SIGN_BASE_URL).rstrip('/') + SIGN_PATH
+        self.student_id = None
+        self.userId = None
+        self.sessionId = None
+        self.session_store = session_store
+        self.relogins = 0
+        self._login_lock = threading.Lock()
+        self.timeout = timeout
+        self.cache = cache
+        self.journal = journal
+        self.on_request = None
+        self.metrics = metrics or RequestMetrics()
+        self.decoder = decoder or decode_json
+        self.retry_counts = Counter()
+        self.breakers = {}
+        self._breakers_lock = threading.Lock()
+        # 覆盖值可以只给出前几项，例如 {'schedule': (20,)} 只改初始速率，其余沿用默认值
+        unknown = set(rate_limits or {}) - set(DEFAULT_RATE_LIMITS)
+        if unknown:
+            raise ValueError(f"未知的限速接口: {', '.join(sorted(unknown))} (可选 {', '.join(DEFAULT_RATE_LIMITS)})")
+        specs = {endpoint: tuple(spec) + DEFAULT_RATE_LIMITS[endpoint][len(spec):]
+                 for endpoint, spec in (rate_limits or {}).items()}
+        self.limiters = {endpoint: TokenBucket(*spec) for endpoint, spec in {**DEFAULT_RATE_LIMITS, **specs}.items()}
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+        self._closed = threading.Event()
+        self.session = requests.Session()
+        # 8346 与 8081 两个主机各自维护一个连接池，pool_size 为每个主机保留的连接数
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _breaker_for(self, url):
+        host = urlparse(url).netloc
+        with self._breakers_lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(f"主机 {host}")
+            return self.breakers[host]
+
+    def _request(self, endpoint, method, url, retries=0, **kwargs):
+        """经过熔断器发送请求；网络异常或 5xx 响应最多重试 retries 次"""
+        breaker = self._breaker_for(url)
+        for attempt in range(retries + 1):
+            self._check_open()
+            breaker.check()
+            error = None
+            try:
+                res = self._send(endpoint, method, url, **kwargs)
+            except requests.RequestException as e:
+                error = e
+            self._check_open()
+            if error is None and res.status_code < 500:
+                breaker.record_success()
+                return res
+            breaker.record_failure()
+            if attempt == retries or breaker.state == 'open':
+                if error:
+                    raise error
+                return res
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            self.retry_counts[endpoint] += 1
+            logger.warning("%s 请求失败 (%s)，%.2f 秒后第 %d/%d 次重试", endpoint,
+                           error or f"HTTP {res.status_code}", delay, attempt + 1, retries)
+            self._closed.wait(delay)  # close() 时立即醒来，下一轮开始时抛出 ClientClosedError
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def _check_open(self):
+        if self._closed.is_set():
+            raise ClientClosedError("客户端已关闭")
+
+    def _send(self, endpoint, method, url, **kwargs):
+        limiter = self.limiters[endpoint]
+        waited = limiter.acquire(limiter.burst - 1 if _background.get() else 0)
+        start = time.perf_counter()
+        with self._inflight:
+            self.metrics.record_wait(endpoint, waited + time.perf_counter() - start)
+            start = time.perf_counter()
+            try:
+                res = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.RequestException as e:
+                self._notify(endpoint, kwargs.get('params'), time.perf_counter() - start, e)
+                raise
+        self._notify(endpoint, kwargs.get('params'), time.perf_counter() - start, res.status_code)
+        self.metrics.record_bytes(endpoint, len(res.content))
+        return res
+
+    @staticmethod
+    @contextlib.contextmanager
+    def background():
+        """
+        在此范围内 (包括 fetch_schedules 派生的线程) 发出的请求都作为后台请求，
+        不占用令牌桶的突发配额，前台请求到来时不必排在它们后面。
+        """
+        token = _background.set(True)
+        try:
+            yield
+        finally:
+            _background.reset(token)
+
+    def _notify(self, endpoint, params, elapsed, result):
+        ok = result == 200
+        self.limiters[endpoint].record(elapsed, ok)
+        self.metrics.record(endpoint, elapsed, ok)
+        if self.on_request:
+            self.on_request(endpoint, params, elapsed, result)
+
+    @property
+    def logged_in(self):
+        return bool(self.userId and self.sessionId)
+
+    def login(self, student_id):
+        """登录并保存 userId/sessionId，返回服务器响应的 JSON"""
+        res = self._request('login', 'GET', self.login_url, params=login_params(student_id))
+        userData = self.decoder(res.content)
+        session = parse_login(userData)
+        if session:
+            self.student_id = student_id
+            self.userId, self.sessionId = session
+            if self.session_store:
+                try:
+                    self.session_store.save(student_id, self.userId, self.sessionId)
+                except OSError as e:
+                    logger.warning("保存登录会话失败: %s", e)  # 只影响下次启动时复用会话，不影响本次登录
+        return userData
+
+    def resume(self, student_id):
+        """复用 session_store 中保存的会话，不访问网络；没有可用的会话时返回 False"""
+        entry = self.session_store.load(student_id) if self.session_store else None
+        if not entry:
+            return False
+        self.student_id = student_id
+        self.userId, self.sessionId = entry['userId'], entry['sessionId']
+        return True
+
+    def _relogin(self, expired_session_id):
+        """会话失效后重新登录，返回是否可以重发请求；其他线程已经重新登录过时不再重复登录"""
+        if not self.student_id:
+            return False
+        with self._login_lock:
+            if self.sessionId != expired_session_id:
+                return True
+            logger.info("登录会话已失效，正在重新登录")
+            try:
+                userData = self.login(self.student_id)
+            except (requests.RequestException, ValueError, KeyError) as e:
+                logger.warning("重新登录失败: %s", e)
+                return False
+            if userData.get('STATUS') != '0':
+                logger.warning("重新登录失败: %s", userData.get('ERRORMSG', '未知错误'))
+                return False
+            self.relogins += 1
+            return True
+
+    def get_course_schedule(self, dateStr, refresh=False):
+        """
+        获取指定日期 (YYYYMMDD) 的课程表，HTTP 状态码非 200 时返回 None。
+        refresh=True 时跳过缓存直接请求服务器；只有 STATUS 为 '0' 的响应会写入缓存。
+        """
+        self._check_open()  # 关闭后缓存也已关闭
+        if self.cache and not refresh:
+            cached = self.cache.get(self.userId, dateStr)
+            if cached is not None:
+                return cached
+        session_id = self.sessionId
+        data, payload = self._fetch_schedule(dateStr)
+        if session_expired(data) and self._relogin(session_id):
+            data, payload = self._fetch_schedule(dateStr)
+        if self.cache and data and data.get('STATUS') == '0':
+            self.cache.put(self.userId, dateStr, payload)
+        return data
+
+    def _fetch_schedule(self, dateStr):
+        params = {'dateStr': dateStr, 'id': self.userId}
+        headers = {'sessionId': self.sessionId}
+        res = self._request('schedule', 'GET', self.schedule_url, retries=SCHEDULE_RETRIES, params=params, headers=headers)
+        return (self.decoder(res.content) if res.status_code == 200 else None), res.content
+
+    async def fetch_schedules_async(self, date_strs, concurrency=8, executor=None):
+        """
+        并发获取多个日期的课程表，同时在途的请求不超过 concurrency 个。
+        按 date_strs 的顺序返回 [(dateStr, 响应 JSON 或异常对象)]，单日失败不影响其他日期。
+        请求在 executor 中执行 (例如 GUI 共用的线程池)，不指定时使用 asyncio 的默认线程池。
+        """
+        import asyncio  # 只有批量获取时才需要，推迟到第一次使用
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def fetch_one(dateStr):
+            async with semaphore:
+                try:
+                    # 与 asyncio.to_thread 一样把 contextvars (如 background()) 带到执行请求的线程
+                    context = contextvars.copy_context()
+                    return await loop.run_in_executor(executor, context.run, self.get_course_schedule, dateStr)
+                except Exception as e:
+                    return e
+
+        results = await asyncio.gather(*(fetch_one(d) for d in date_strs))
+        return list(zip(date_strs, results))
+
+    def fetch_schedules(self, date_strs, concurrency=8, executor=None):
+        """fetch_schedules_async 的同步入口"""
+        import asyncio
+        return asyncio.run(self.fetch_schedules_async(date_strs, concurrency, executor))
+
+    def sign_course(self, courseSchedId):
+        """课程打卡，返回是否成功"""
+        try:
+            ok = self._sign_course(courseSchedId)
+        except ClientClosedError:
+            raise  # 打卡记录已关闭，也无法确认是否打卡成功
+        except requests.RequestException as e:
+            if self.journal:
+                self.journal.record(self.userId, courseSchedId, False, error=str(e))
+            raise
+        if self.journal:
+            self.journal.record(self.userId, courseSchedId, ok)
+        return ok
+
+    def _sign_course(self, courseSchedId):
+        params = {
+            'courseSchedId': courseSchedId,
+            'timestamp': int(time.time() * 1000),
+            'id': self.userId
+        }
+        r = self._request('sign', 'POST', self.sign_url, params=params)
+        if r.status_code != 200:
+            return False
+        try:
+            json_data = self.decoder(r.content)
+        except ValueError:
+            json_data = None
+        return sign_succeeded(json_data, r.text)
+
+    def is_signed(self, courseSchedId):
+        """打卡记录中是否已有该课程的成功记录"""
+        return bool(self.journal) and self.journal.is_signed(self.userId, courseSchedId)
+
+    def close(self):
+        self._closed.set()
+        self.session.close()
+        if self.cache:
+            self.cache.close()
+        if self.journal:
+            self.journal.close()
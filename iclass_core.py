@@ -0,0 +1,144 @@
+import datetime
+import json
+import os
+
+try:
+    import orjson  # 可选依赖，安装后 JSON 解析更快
+except ImportError:
+    orjson = None
+
+# 只依赖标准库 (orjson 可选)：CLI / GUI 启动时导入本模块，requests 等网络依赖在第一次请求前才由 iclass_client 导入
+
+# 服务器地址可用环境变量覆盖，例如指向 mock_server.py 启动的本地模拟服务器
+DEFAULT_BASE_URL = os.environ.get('ICLASS_BASE_URL', 'https://iclass.buaa.edu.cn:8346')
+DEFAULT_SIGN_BASE_URL = os.environ.get('ICLASS_SIGN_BASE_URL', 'http://iclass.buaa.edu.cn:8081')
+LOGIN_PATH = '/app/user/login.action'
+SCHEDULE_PATH = '/app/course/get_stu_course_sched.action'
+SIGN_PATH = '/app/course/stu_scan_sign.action'
+
+# 各接口的限速: (初始每秒请求数, 突发上限, 最高每秒请求数)，统一在这里调整；
+# 放在本模块而不是 iclass_client，CLI 参数与 settings.json 在导入 requests 之前就能据此校验接口名。
+# 服务器响应良好时速率从初始值逐步升到最高值，出错或变慢时减半 (见 rate_limiter.TokenBucket)
+DEFAULT_RATE_LIMITS = {
+    'login': (1, 2, 1),
+    'schedule': (10, 8, 40),
+    'sign': (3, 2, 6),
+}
+
+
+JSON_BACKEND = 'orjson' if orjson else 'json'  # 实际使用的 JSON 解析库，显示在统计信息与性能测试报告中
+
+
+def decode_json(data):
+    """
+    直接从响应的原始字节 (也接受 str) 解析 JSON，不先解码为字符串；安装了 orjson 时使用 orjson。
+    格式错误时抛出 json.JSONDecodeError (orjson.JSONDecodeError 是它的子类)。
+    """
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def login_params(student_id):
+    return {
+        'password': '',
+        'phone': student_id,
+        'userLevel': '1',
+        'verificationType': '2',
+        'verificationUrl': ''
+    }
+
+
+def parse_login(userData):
+    """登录成功时返回 (userId, sessionId)，否则返回 None"""
+    if userData.get('STATUS') != '0':
+        return None
+    return userData['result']['id'], userData['result']['sessionId']
+
+
+class Course:
+    """
+    一节课，由课表响应中的一项解析而来，只保留用到的字段；创建后不可修改 (可作为字典键与集合元素)。
+    begin / end 为 datetime，显示用的文本由 date_text / time_text 生成。
+    不用 dataclass(frozen=True, slots=True)：slots 需要 Python 3.10，且 dataclasses 会拖慢本模块的导入。
+    """
+    __slots__ = ('id', 'name', 'teacher', 'room', 'begin', 'end')
+
+    def __init__(self, id, name, teacher, room, begin, end):
+        for field, value in zip(self.__slots__, (id, name, teacher, room, begin, end)):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Course 创建后不可修改: {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Course 创建后不可修改: {name}")
+
+    @classmethod
+    def from_json(cls, item):
+        return cls(str(item['id']), item.get('courseName') or '未知课程', item.get('teacherName'),
+                   item.get('classroomName'), datetime.datetime.fromisoformat(item['classBeginTime']),
+                   datetime.datetime.fromisoformat(item['classEndTime']))
+
+    @property
+    def date_text(self):
+        return f"{self.begin:%Y-%m-%d}"
+
+    @property
+    def time_text(self):
+        return f"{self.begin:%H:%M}-{self.end:%H:%M}"
+
+    def _key(self):
+        return self.id, self.name, self.teacher, self.room, self.begin, self.end
+
+    def __eq__(self, other):
+        return isinstance(other, Course) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"Course({self.id!r}, {self.name!r}, {self.date_text} {self.time_text})"
+
+
+# 课表接口的错误信息中出现这些词时，视为 sessionId 已失效，需要重新登录
+SESSION_EXPIRED_HINTS = ('失效', '过期', '重新登录', 'session')
+
+
+def session_expired(json_data):
+    """课表响应是否表示 sessionId 已失效"""
+    if not json_data or json_data.get('STATUS') == '0':
+        return False
+    message = str(json_data.get('ERRORMSG', '')).lower()
+    return any(hint in message for hint in SESSION_EXPIRED_HINTS)
+
+
+def courses_from(json_data):
+    """
+    把课表响应解析为 Course 列表，获取失败时返回 None；result 缺失或为 null 表示当天没有课程。
+    课程项格式错误时抛出 KeyError / ValueError / TypeError / AttributeError，调用方统一作为数据格式错误处理。
+    """
+    if not json_data or json_data.get('STATUS') != '0':
+        return None
+    return [Course.from_json(item) for item in json_data.get('result') or []]
+
+
+# courses_from 遇到格式错误的响应时可能抛出的异常
+SCHEDULE_FORMAT_ERRORS = (KeyError, ValueError, TypeError, AttributeError)
+
+
+def schedule_fingerprint(courses):
+    """
+    一天课表的指纹：按上课时间与 id 排序后对各课程的全部字段求哈希，与服务器返回的顺序无关。
+    指纹相同说明课表没有变化，界面与索引据此跳过重新渲染与通知。
+    """
+    import hashlib  # 只有比较课表时才需要
+    digest = hashlib.blake2b(digest_size=8)
+    for course in sorted(courses, key=lambda course: (course.begin, course.id)):
+        digest.update(repr(course._key()).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def sign_succeeded(json_data, text):
+    """打卡响应是否表示成功；响应不是 JSON 时 json_data 为 None，按文本判断"""
+    if json_data is None:
+        return '成功' in text or 'SUCCESS' in text
+    return json_data.get('STATUS') == '0'
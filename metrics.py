@@ -0,0 +1,73 @@
+import threading
+from collections import defaultdict, deque
+
+
+def percentile(sorted_values, pct):
+    """最近秩法求分位数，sorted_values 为空时返回 0"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class RequestMetrics:
+    """
+    网络层的性能统计，可在多个线程中同时记录：
+    - 每个接口的请求次数、错误次数与延迟 (p50/p95/p99，基于最近 max_samples 次)。
+    - 每个接口在限速器上的等待时间，用于区分慢在服务器还是慢在限速。
+    - 每个接口的响应字节数。
+    """
+
+    def __init__(self, max_samples=5000):
+        self.max_samples = max_samples
+        self._counts = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._latencies = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._waits = defaultdict(float)
+        self._bytes = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, elapsed, ok):
+        with self._lock:
+            self._counts[endpoint] += 1
+            if not ok:
+                self._errors[endpoint] += 1
+            self._latencies[endpoint].append(elapsed)
+
+    def record_wait(self, endpoint, waited):
+        with self._lock:
+            self._waits[endpoint] += waited
+
+    def record_bytes(self, endpoint, size):
+        with self._lock:
+            self._bytes[endpoint] += size
+
+    def snapshot(self):
+        """{endpoint: {count, errors, error_rate, p50, p95, p99, wait, bytes}}，时间单位为秒，bytes 为响应总字节数"""
+        with self._lock:
+            endpoints = sorted(set(self._counts) | set(self._waits))
+            samples = {endpoint: sorted(self._latencies[endpoint]) for endpoint in endpoints}
+            counts, errors, waits, sizes = dict(self._counts), dict(self._errors), dict(self._waits), dict(self._bytes)
+        stats = {}
+        for endpoint in endpoints:
+            count = counts.get(endpoint, 0)
+            stats[endpoint] = {
+                'count': count,
+                'errors': errors.get(endpoint, 0),
+                'error_rate': errors.get(endpoint, 0) / count if count else 0.0,
+                'p50': percentile(samples[endpoint], 50),
+                'p95': percentile(samples[endpoint], 95),
+                'p99': percentile(samples[endpoint], 99),
+                'wait': waits.get(endpoint, 0.0),
+                'bytes': sizes.get(endpoint, 0),
+            }
+        return stats
+
+    def summary_lines(self):
+        lines = [f"{'接口':<10}{'请求数':>8}{'错误率':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+                 f"{'限速等待(s)':>12}{'响应(KB)':>10}"]
+        for endpoint, s in self.snapshot().items():
+            # 表头中的汉字占两列宽，数据列按显示宽度对齐
+            lines.append(f"{endpoint:<12}{s['count']:>11}{s['error_rate']:>11.1%}{s['p50'] * 1000:>10.0f}"
+                         f"{s['p95'] * 1000:>10.0f}{s['p99'] * 1000:>10.0f}{s['wait']:>16.2f}{s['bytes'] / 1024:>12.1f}")
+        return lines
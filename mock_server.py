@@ -0,0 +1,187 @@
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from iclass_core import LOGIN_PATH, SCHEDULE_PATH, SIGN_PATH
+
+COURSE_NAMES = ["高等数学", "大学物理", "程序设计基础", "离散数学", "数据结构", "大学英语", "体育", "形势与政策"]
+CLASS_SLOTS = [("08:00", "09:35"), ("09:50", "11:25"), ("14:00", "15:35"), ("15:50", "17:25"), ("19:00", "20:35")]
+
+
+def synthetic_schedule(date_str, empty_after=None):
+    """按日期确定性地生成课程表：工作日 2~4 节课，周末和 empty_after 之后 (含) 没课"""
+    date = datetime.datetime.strptime(date_str, '%Y%m%d')
+    if date.weekday() >= 5 or (empty_after and date_str >= empty_after):
+        return []
+    rng = random.Random(date_str)
+    day = date.strftime('%Y-%m-%d')
+    return [{
+        'id': f"{date_str}{slot:02d}",
+        'courseName': rng.choice(COURSE_NAMES),
+        'classBeginTime': f"{day} {CLASS_SLOTS[slot][0]}:00",
+        'classEndTime': f"{day} {CLASS_SLOTS[slot][1]}:00",
+        'classroomName': f"J{rng.randint(1, 4)}-{rng.randint(1, 5)}{rng.randint(1, 20):02d}",
+        'teacherName': rng.choice(["张老师", "李老师", "王老师", "赵老师"]),
+    } for slot in sorted(rng.sample(range(len(CLASS_SLOTS)), rng.randint(2, 4)))]
+
+
+class MockIClassServer:
+    """
+    本地模拟的 iClass 服务器，提供 login / get_stu_course_sched / stu_scan_sign 三个接口，用于离线测试与性能测试：
+    - 每个请求先等待 latency ± jitter 秒。
+    - 按 error_rate 的概率返回 HTTP 500，按 timeout_rate 的概率等待 hang 秒后才响应 (用于触发客户端超时)。
+    - 课程表由 synthetic_schedule 生成；打卡过的 courseSchedId 记录在 signed 中。
+    - 设置 session_ttl 时，sessionId 签发后超过 session_ttl 秒即失效，课表接口返回需要重新登录。
+    登录与打卡共用同一个端口，把 base_url 与 sign_base_url 都指向 url 即可。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, jitter=0.0, error_rate=0.0, timeout_rate=0.0, hang=30,
+                 empty_after=None, session_ttl=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.empty_after = empty_after
+        self.session_ttl = session_ttl
+        self.requests = 0
+        self.signed = set()
+        self._sessions = {}  # sessionId -> (userId, 签发时间)
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在后台线程中运行，返回自身以便链式调用"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # 支持 keep-alive，与真实服务器一样可以复用连接
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+            def do_POST(self):
+                server._handle(self)
+
+        return Handler
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests += 1
+            roll = self._rng.random()
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        if roll < self.timeout_rate:
+            delay = self.hang
+        time.sleep(delay)
+        if roll < self.timeout_rate + self.error_rate:
+            self._reply(handler, 500, {'STATUS': '1', 'ERRORMSG': '服务器内部错误'})
+            return
+        url = urlparse(handler.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == LOGIN_PATH:
+            body = self._login(params)
+        elif url.path == SCHEDULE_PATH:
+            body = self._schedule(params, handler.headers.get('sessionId'))
+        elif url.path == SIGN_PATH:
+            body = self._sign(params)
+        else:
+            self._reply(handler, 404, {'STATUS': '1', 'ERRORMSG': '接口不存在'})
+            return
+        self._reply(handler, 200, body)
+
+    def _login(self, params):
+        if not params.get('phone'):
+            return {'STATUS': '1', 'ERRORMSG': '学号不能为空'}
+        session_id = uuid.uuid4().hex
+        user_id = f"u{params['phone']}"
+        with self._lock:
+            self._sessions[session_id] = (user_id, time.monotonic())
+        return {'STATUS': '0', 'result': {'id': user_id, 'sessionId': session_id}}
+
+    def _schedule(self, params, session_id):
+        with self._lock:
+            user_id, issued_at = self._sessions.get(session_id, (None, 0))
+        expired = self.session_ttl is not None and time.monotonic() - issued_at > self.session_ttl
+        if user_id is None or user_id != params.get('id') or expired:
+            return {'STATUS': '2', 'ERRORMSG': '登录已失效，请重新登录'}
+        try:
+            return {'STATUS': '0', 'result': synthetic_schedule(params['dateStr'], self.empty_after)}
+        except (KeyError, ValueError):
+            return {'STATUS': '1', 'ERRORMSG': '日期格式错误'}
+
+    def _sign(self, params):
+        if not params.get('courseSchedId') or not params.get('id'):
+            return {'STATUS': '1', 'ERRORMSG': '参数错误'}
+        with self._lock:
+            self.signed.add(params['courseSchedId'])
+        return {'STATUS': '0', 'ERRORMSG': '签到成功'}
+
+    @staticmethod
+    def _reply(handler, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json;charset=UTF-8')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="本地模拟 iClass 服务器。启动后设置 ICLASS_BASE_URL 与 "
+                                                 "ICLASS_SIGN_BASE_URL 为打印出的地址，GUI / CLI 即连接到模拟服务器。")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8346)
+    parser.add_argument('--latency', type=float, default=0.05, help="每个请求的基础延迟 (秒)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="延迟的随机波动范围 (秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回 HTTP 500 的概率")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="挂起 --hang 秒后才响应的概率")
+    parser.add_argument('--hang', type=float, default=30, help="模拟超时时挂起的秒数")
+    parser.add_argument('--session-ttl', type=float, help="sessionId 的有效期 (秒)，默认不过期")
+    parser.add_argument('--empty-after', help="从该日期 (YYYYMMDD) 起没有课程，模拟假期")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server = MockIClassServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.timeout_rate,
+                              args.hang, args.empty_after, args.session_ttl)
+    print(f"模拟服务器已启动: {server.url}  (Ctrl+C 退出)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶限速器，可在多个线程中共用：
+    - 平时以 rate 个/秒补充令牌，最多积累 burst 个，空闲后允许短时突发。
+    - record() 反馈请求结果 (AIMD)：出错或响应慢于 slow_threshold 时速率减半 (不低于 min_rate)；
+      每次正常响应速率加上初始 rate 的 10%，可以超过初始速率，直到 max_rate (默认等于 rate，即不超过初始速率)。
+      服务器一直响应良好时吞吐量逐步升到 max_rate，开始出错或变慢时立即回落。
+    - acquire(reserve) 只在取走后仍剩至少 reserve 个令牌时才取，后台请求借此把突发配额留给前台。
+    """
+
+    def __init__(self, rate, burst, max_rate=None, min_rate=0.5, slow_threshold=2.0):
+        self.base_rate = rate
+        self.rate = rate
+        self.max_rate = max(rate, max_rate or rate)
+        self.burst = burst
+        self.min_rate = min(min_rate, rate)
+        self.slow_threshold = slow_threshold
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, reserve=0):
+        """取走一个令牌，没有可用令牌 (或取走后少于 reserve 个) 时等待，返回等待的秒数"""
+        need = 1 + min(reserve, self.burst - 1)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= need:
+                    self._tokens -= 1
+                    return waited
+                delay = (need - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def record(self, elapsed, ok):
+        with self._lock:
+            self._refill(time.monotonic())
+            if not ok or elapsed > self.slow_threshold:
+                self.rate = max(self.min_rate, self.rate / 2)
+            elif self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.base_rate * 0.1)
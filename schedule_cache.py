@@ -0,0 +1,94 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+from iclass_core import decode_json
+
+DATA_DIR = os.path.join(os.path.expanduser('~'), '.buaasigntool')
+DEFAULT_CACHE_PATH = os.path.join(DATA_DIR, 'schedule_cache.sqlite3')
+
+PAST_TTL = 7 * 24 * 3600
+CURRENT_TTL = 10 * 60
+
+
+def schedule_ttl(date_str, fetched_at):
+    """
+    课程表数据的有效期 (秒)：在该日期结束之后获取的数据几乎不会再变，使用较长的 PAST_TTL；
+    当天及以后的日期随时可能调整，使用较短的 CURRENT_TTL。
+    """
+    day_end = datetime.datetime.strptime(date_str, '%Y%m%d') + datetime.timedelta(days=1)
+    return PAST_TTL if fetched_at >= day_end.timestamp() else CURRENT_TTL
+
+
+def is_fresh(date_str, fetched_at):
+    return time.time() - fetched_at <= schedule_ttl(date_str, fetched_at)
+
+
+class ScheduleCache:
+    """
+    课程表本地缓存 (SQLite)，以 (userId, dateStr) 为键保存 get_stu_course_sched.action 的响应原文 (JSON 字节)，
+    读取时用 decode_json 解析；有效期见 schedule_ttl；hits / misses 记录命中与未命中次数。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS schedule ('
+                           'user_id TEXT NOT NULL, date_str TEXT NOT NULL, fetched_at REAL NOT NULL, '
+                           'payload TEXT NOT NULL, PRIMARY KEY (user_id, date_str))')
+        self._conn.commit()
+
+    def get(self, user_id, date_str):
+        """读取未过期的缓存，未命中或已过期时返回 None"""
+        with self._lock:
+            row = self._conn.execute('SELECT fetched_at, payload FROM schedule WHERE user_id = ? AND date_str = ?',
+                                     (str(user_id), date_str)).fetchone()
+            if row is None or not is_fresh(date_str, row[0]):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return decode_json(row[1])
+
+    def peek(self, user_id, date_str):
+        """不论是否过期都返回缓存 (fetched_at, data)，没有时返回 None；用于离线先显示，不计入命中统计"""
+        with self._lock:
+            row = self._conn.execute('SELECT fetched_at, payload FROM schedule WHERE user_id = ? AND date_str = ?',
+                                     (str(user_id), date_str)).fetchone()
+        return (row[0], decode_json(row[1])) if row else None
+
+    def put(self, user_id, date_str, payload):
+        """payload 为响应的 JSON 原文 (bytes 或 str)，原样保存"""
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO schedule VALUES (?, ?, ?, ?)',
+                               (str(user_id), date_str, time.time(), payload))
+            self._conn.commit()
+
+    def invalidate(self, user_id=None, date_strs=None):
+        """删除缓存条目，不指定参数时清空全部，返回删除的条数"""
+        sql, args = 'DELETE FROM schedule WHERE 1 = 1', []
+        if user_id is not None:
+            sql += ' AND user_id = ?'
+            args.append(str(user_id))
+        if date_strs is not None:
+            date_strs = list(date_strs)
+            sql += f" AND date_str IN ({', '.join('?' * len(date_strs))})"
+            args.extend(date_strs)
+        with self._lock:
+            count = self._conn.execute(sql, args).rowcount
+            self._conn.commit()
+        return count
+
+    def stats_text(self):
+        total = self.hits + self.misses
+        ratio = self.hits / total * 100 if total else 0
+        return f"缓存命中 {self.hits} 次，未命中 {self.misses} 次 (命中率 {ratio:.0f}%)"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,102 @@
+import csv
+import datetime
+
+from iclass_core import SCHEDULE_FORMAT_ERRORS, courses_from
+from semester_index import SEMESTER_WEEKS
+
+EXPORT_FORMATS = ('ics', 'csv')
+CSV_FIELDS = ['courseSchedId', 'courseName', 'date', 'begin', 'end', 'classroom', 'teacher']
+ICS_TIMEZONE = 'Asia/Shanghai'  # classBeginTime / classEndTime 为北京时间
+ICS_LINE_OCTETS = 75  # RFC 5545: 每行最多 75 个字节，超出时折行
+
+
+def semester_days(client, semester_start, weeks=SEMESTER_WEEKS, concurrency=8, on_error=None):
+    """
+    从 semester_start (datetime) 起逐周批量获取课程表 (经过客户端的本地缓存)，按日期顺序产出 (date_str, courses)。
+    获取失败的日期产出 courses 为 None，并通过 on_error(date_str, message) 报告。
+    只保留当前一周的数据，导出整个学期时内存占用与周数无关。
+    """
+    for week in range(weeks):
+        week_start = semester_start + datetime.timedelta(weeks=week)
+        date_strs = [(week_start + datetime.timedelta(days=i)).strftime('%Y%m%d') for i in range(7)]
+        for date_str, result in client.fetch_schedules(date_strs, concurrency):
+            courses, error = None, result
+            if not isinstance(result, Exception):
+                try:
+                    courses = courses_from(result)
+                    error = None if courses is not None else (result or {}).get('ERRORMSG', '未知错误')
+                except SCHEDULE_FORMAT_ERRORS as e:
+                    error = f"课程数据格式错误: {e}"
+            if error is not None and on_error:
+                on_error(date_str, str(error))
+            yield date_str, courses
+
+
+def write_csv(days, f):
+    """把 (date_str, courses) 逐行写入 CSV，返回写入的课程数；f 应以 newline='' 打开"""
+    writer = csv.writer(f)
+    writer.writerow(CSV_FIELDS)
+    count = 0
+    for _, courses in days:
+        for course in courses or []:
+            writer.writerow([course.id, course.name, course.date_text, f"{course.begin:%Y-%m-%d %H:%M:%S}",
+                             f"{course.end:%Y-%m-%d %H:%M:%S}", course.room or '', course.teacher or ''])
+            count += 1
+    return count
+
+
+def _ics_escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _ics_line(line):
+    """按 UTF-8 字节数折行 (续行以空格开头)，不拆开多字节字符"""
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > ICS_LINE_OCTETS:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def write_ics(days, f, calendar_name='北航课程表'):
+    """把 (date_str, courses) 逐门课程写成 iCalendar 事件，返回写入的课程数；f 应以 newline='' 打开"""
+    stamp = f"{datetime.datetime.now(datetime.timezone.utc):%Y%m%dT%H%M%SZ}"
+    for line in ('BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//ClassSignTool//BUAA iClass//ZH', 'CALSCALE:GREGORIAN',
+                 f"X-WR-CALNAME:{_ics_escape(calendar_name)}", f"X-WR-TIMEZONE:{ICS_TIMEZONE}",
+                 'BEGIN:VTIMEZONE', f"TZID:{ICS_TIMEZONE}", 'BEGIN:STANDARD', 'DTSTART:19700101T000000',
+                 'TZOFFSETFROM:+0800', 'TZOFFSETTO:+0800', 'TZNAME:CST', 'END:STANDARD', 'END:VTIMEZONE'):
+        f.write(_ics_line(line))
+    count = 0
+    for _, courses in days:
+        for course in courses or []:
+            lines = ['BEGIN:VEVENT', f"UID:{course.id}@iclass.buaa.edu.cn", f"DTSTAMP:{stamp}",
+                     f"DTSTART;TZID={ICS_TIMEZONE}:{course.begin:%Y%m%dT%H%M%S}",
+                     f"DTEND;TZID={ICS_TIMEZONE}:{course.end:%Y%m%dT%H%M%S}",
+                     f"SUMMARY:{_ics_escape(course.name)}"]
+            if course.room:
+                lines.append(f"LOCATION:{_ics_escape(course.room)}")
+            if course.teacher:
+                lines.append(f"DESCRIPTION:{_ics_escape(f'教师: {course.teacher}')}")
+            lines.append('END:VEVENT')
+            f.write(''.join(_ics_line(line) for line in lines))
+            count += 1
+    f.write(_ics_line('END:VCALENDAR'))
+    return count
+
+
+def export_semester(days, path, fmt=None):
+    """
+    把 semester_days 产出的课程流式写入 path，fmt 为 'ics' 或 'csv'，不指定时按扩展名判断。
+    CSV 使用带 BOM 的 UTF-8，便于 Excel 直接打开。返回写入的课程数。
+    """
+    fmt = fmt or path.rsplit('.', 1)[-1].lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt} (可选 {', '.join(EXPORT_FORMATS)})")
+    with open(path, 'w', encoding='utf-8-sig' if fmt == 'csv' else 'utf-8', newline='') as f:
+        return write_csv(days, f) if fmt == 'csv' else write_ics(days, f)
@@ -0,0 +1,166 @@
+import datetime
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from iclass_core import SCHEDULE_FORMAT_ERRORS, courses_from, schedule_fingerprint
+from schedule_cache import is_fresh
+
+SEMESTER_WEEKS = 18
+
+
+class SemesterIndex:
+    """
+    学期课表索引：日期 -> 课程列表 (iclass_core.Course)，课程名 -> 上课记录。
+    - 查询时只重新获取不在索引中或已过期 (见 schedule_cache.schedule_ttl) 的日期。
+    - 获取失败的日期不写入索引，通过 on_error(date_str, message) 回调报告。
+    - 每天的课表记录指纹 (iclass_core.schedule_fingerprint)，重新获取后内容有变化 (或第一次获取) 时
+      调用 on_change(date_str, courses)；invalidate 不清除指纹，刷新后内容相同不会触发回调。
+    - 可在多个线程中同时使用；传入 executor 时批量获取的请求在其中执行 (GUI 共用的线程池)，否则使用 asyncio 的默认线程池。
+    """
+
+    def __init__(self, client, semester_start=None, weeks=SEMESTER_WEEKS, on_error=None, concurrency=8,
+                 on_change=None, executor=None):
+        self.client = client
+        self.semester_start = semester_start
+        self.weeks = weeks
+        self.on_error = on_error
+        self.concurrency = concurrency
+        self.on_change = on_change
+        self.executor = executor
+        self._days = {}  # date_str -> (courses, fetched_at)
+        self._by_name = {}  # courseName -> {date_str: [course, ...]}
+        self._fingerprints = {}  # date_str -> 最近一次获取的课表指纹
+        self._lock = threading.Lock()
+
+    def week_dates(self, week_number):
+        start_date = self.semester_start + datetime.timedelta(weeks=week_number - 1)
+        return [(start_date + datetime.timedelta(days=i)).strftime('%Y%m%d') for i in range(7)]
+
+    def get(self, date_str):
+        """只读查询，不在索引中或已过期时返回 None"""
+        with self._lock:
+            entry = self._days.get(date_str)
+        return entry[0] if entry and is_fresh(date_str, entry[1]) else None
+
+    def stale_dates(self, date_strs):
+        return [date_str for date_str in date_strs if self.get(date_str) is None]
+
+    def day(self, date_str):
+        """查询单日课程，需要时同步获取；失败返回 None"""
+        return self.ensure([date_str])[0][1]
+
+    def week(self, week_number):
+        """查询一周七天的课程，返回 [(date_str, courses 或 None)]"""
+        return self.ensure(self.week_dates(week_number))
+
+    def ensure(self, date_strs, concurrency=None):
+        """
+        按 date_strs 的顺序返回 [(date_str, courses 或 None)]。
+        只有过期的日期会请求服务器，多个日期时并发获取 (最多 concurrency 个，默认 self.concurrency)。
+        """
+        stale = self.stale_dates(date_strs)
+        if len(stale) == 1:
+            try:
+                self._store(stale[0], self.client.get_course_schedule(stale[0]))
+            except Exception as e:
+                self._report(stale[0], e)
+        elif stale:
+            for date_str, result in self.client.fetch_schedules(stale, concurrency or self.concurrency,
+                                                                self.executor):
+                if isinstance(result, Exception):
+                    self._report(date_str, result)
+                else:
+                    self._store(date_str, result)
+        return [(date_str, self.get(date_str)) for date_str in date_strs]
+
+    def build(self, concurrency=None, before_week=None):
+        """
+        按周获取整个学期中所有过期的日期，适合登录后在后台调用。
+        后台建立时 concurrency 可以比前台查询小；before_week() 在每周获取之前调用，
+        可以在前台加载期间阻塞，把限速器的配额让给用户正在看的那一周。
+        """
+        days = []
+        for week in range(1, self.weeks + 1):
+            if before_week:
+                before_week()
+            days += self.ensure(self.week_dates(week), concurrency)
+        return days
+
+    def scan(self, start_date_str, max_days, empty_days, window=None):
+        """
+        从 start_date_str 起按日期顺序产出 (date_str, courses)，连续 empty_days 天没课时停止，最多 max_days 天。
+        游标之前始终有 window 天在并发获取 (预读)，停止后尚未用到的结果直接丢弃；
+        假期时判断停止只需约一次往返，而不是逐天等待。
+        生成器结束前取消排队中的预读，并等待已发出的请求返回，之后不会再有请求使用 client。
+        """
+        window = window or self.concurrency
+        start_date = datetime.datetime.strptime(start_date_str, '%Y%m%d')
+        dates = ((start_date + datetime.timedelta(days=i)).strftime('%Y%m%d') for i in range(max_days))
+        pool = ThreadPoolExecutor(max_workers=window)
+        try:
+            pending = deque((date_str, pool.submit(self.day, date_str)) for date_str in itertools.islice(dates, window))
+            empty = 0
+            while pending and empty < empty_days:
+                date_str, future = pending.popleft()
+                next_date = next(dates, None)
+                if next_date:
+                    pending.append((next_date, pool.submit(self.day, next_date)))
+                courses = future.result()
+                yield date_str, courses
+                if courses is not None:
+                    empty = 0 if courses else empty + 1
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def sessions(self, course_name):
+        """某门课程在索引中的全部上课记录，按日期排序"""
+        with self._lock:
+            by_date = dict(self._by_name.get(course_name, {}))
+        return [course for date_str in sorted(by_date) for course in by_date[date_str]]
+
+    def course_names(self):
+        with self._lock:
+            return sorted(self._by_name)
+
+    def invalidate(self, date_strs=None):
+        """移出索引，下次查询时重新获取；不指定日期时清空"""
+        with self._lock:
+            for date_str in list(self._days) if date_strs is None else date_strs:
+                self._remove(date_str)
+
+    def _store(self, date_str, json_data):
+        try:
+            courses = courses_from(json_data)
+        except SCHEDULE_FORMAT_ERRORS as e:
+            self._report(date_str, f"课程数据格式错误: {e}")
+            return
+        if courses is None:
+            self._report(date_str, (json_data or {}).get('ERRORMSG', '未知错误'))
+            return
+        fingerprint = schedule_fingerprint(courses)
+        with self._lock:
+            self._remove(date_str)
+            self._days[date_str] = (courses, time.time())
+            for course in courses:
+                self._by_name.setdefault(course.name, {}).setdefault(date_str, []).append(course)
+            changed = self._fingerprints.get(date_str) != fingerprint
+            self._fingerprints[date_str] = fingerprint
+        if changed and self.on_change:
+            self.on_change(date_str, courses)
+
+    def _remove(self, date_str):
+        entry = self._days.pop(date_str, None)
+        if entry is None:
+            return
+        for course in entry[0]:
+            by_date = self._by_name.get(course.name, {})
+            by_date.pop(date_str, None)
+            if not by_date:
+                self._by_name.pop(course.name, None)
+
+    def _report(self, date_str, error):
+        if self.on_error:
+            self.on_error(date_str, str(error))
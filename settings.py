@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from iclass_core import DEFAULT_RATE_LIMITS
+from schedule_cache import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_PATH = os.path.join(DATA_DIR, 'settings.json')
+SESSION_MAX_AGE = 24 * 3600  # 保存的登录会话超过这个时间 (秒) 就不再复用
+
+_lock = threading.RLock()
+
+
+def load_settings(path=SETTINGS_PATH):
+    """读取上次保存的设置 (学号、userId、学期开始日期等)，文件不存在或损坏时返回空字典"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return settings if isinstance(settings, dict) else {}
+
+
+def save_settings(path=SETTINGS_PATH, **values):
+    """把 values 合并进已保存的设置；先写临时文件再替换，写入中断不会损坏原文件"""
+    with _lock:
+        settings = {**load_settings(path), **values}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+def rate_limit_overrides(settings):
+    """
+    设置中的 rate_limits，例如 {"schedule": [20, 8, 60]} (初始每秒请求数, 突发上限, 最高每秒请求数，可只写前几项)，
+    转换为 IClassClient 的 rate_limits；接口名不在 DEFAULT_RATE_LIMITS 中或格式不对的项记录警告后忽略。
+    """
+    overrides = {}
+    rate_limits = settings.get('rate_limits') or {}
+    if not isinstance(rate_limits, dict):
+        logger.warning("设置中的 rate_limits 应为对象，已忽略: %r", rate_limits)
+        return overrides
+    for endpoint, spec in rate_limits.items():
+        spec = spec if isinstance(spec, list) else [spec]
+        if endpoint not in DEFAULT_RATE_LIMITS:
+            logger.warning("设置中的限速接口 %r 不存在 (可选 %s)，已忽略", endpoint, ', '.join(DEFAULT_RATE_LIMITS))
+        elif spec and len(spec) <= 3 and all(isinstance(v, (int, float)) and not isinstance(v, bool) and v > 0
+                                             for v in spec):
+            overrides[endpoint] = tuple(spec)
+        else:
+            logger.warning("设置中 %s 的限速格式错误，已忽略: %r", endpoint, spec)
+    return overrides
+
+
+class SessionStore:
+    """
+    在设置文件的 sessions 中按学号保存登录会话 {userId, sessionId, issued_at}，
+    IClassClient 启动时据此跳过登录请求；超过 max_age 秒的会话不再复用。
+    """
+
+    def __init__(self, path=SETTINGS_PATH, max_age=SESSION_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+
+    def load(self, student_id):
+        """返回未过期的会话，没有时返回 None"""
+        entry = load_settings(self.path).get('sessions', {}).get(str(student_id))
+        if not entry or time.time() - entry.get('issued_at', 0) > self.max_age:
+            return None
+        return entry
+
+    def save(self, student_id, user_id, session_id):
+        with _lock:
+            sessions = load_settings(self.path).get('sessions', {})
+            sessions[str(student_id)] = {'userId': user_id, 'sessionId': session_id, 'issued_at': time.time()}
+            save_settings(self.path, sessions=sessions)
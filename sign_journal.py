@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+import time
+
+from schedule_cache import DATA_DIR
+
+DEFAULT_JOURNAL_PATH = os.path.join(DATA_DIR, 'sign_journal.jsonl')
+
+
+class SignJournal:
+    """
+    打卡记录 (JSON Lines，只追加)，每次打卡尝试写一行 {time, userId, courseSchedId, ok[, error]}。
+    启动时读入已有记录，批量打卡据此跳过已确认成功的课程，只重试失败或未打过的。
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._signed = set()  # 已确认成功的 (userId, courseSchedId)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 写入中断留下的残行
+                    if entry.get('ok'):
+                        self._signed.add((str(entry['userId']), str(entry['courseSchedId'])))
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def record(self, user_id, course_sched_id, ok, error=None):
+        entry = {'time': time.time(), 'userId': str(user_id), 'courseSchedId': str(course_sched_id), 'ok': ok}
+        if error:
+            entry['error'] = error
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+            if ok:
+                self._signed.add((entry['userId'], entry['courseSchedId']))
+
+    def is_signed(self, user_id, course_sched_id):
+        with self._lock:
+            return (str(user_id), str(course_sched_id)) in self._signed
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,83 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+logger = logging.getLogger(__name__)
+
+
+def _notify(callback, *args):
+    """调用进度回调；回调出错只记录日志，不能中断获取或打卡 (否则已占用的打卡名额不会释放，调用方会一直等待)"""
+    if callback is None:
+        return
+    try:
+        callback(*args)
+    except Exception:
+        logger.exception("批量打卡的进度回调失败")
+
+
+def stream_sign(index, date_strs, sign, is_signed=None, fetch_workers=7, sign_workers=4, on_day=None, on_sign=None,
+                executor=None):
+    """
+    边获取边打卡：date_strs 中各天的课表并发获取，哪天先返回就先提交它的课程调用 sign(course_id) 打卡，
+    获取与打卡同时进行，总耗时约为较慢的一个阶段，而不是两者之和。
+    同时进行的打卡不超过 sign_workers 个，打卡跟不上时调用方等待，不会无限堆积。
+    - 获取与打卡都在 executor 中执行 (例如 GUI 共用的线程池)；不指定时临时创建 fetch_workers + sign_workers 个线程的线程池。
+      调用方线程负责等待，executor 中的任务不会互相等待，共用有界线程池也不会死锁。
+    - is_signed(course_id) 为真的课程跳过 (打卡记录中已确认成功)。
+    - on_day(date_str, courses) 在每天获取完成后调用，失败时 courses 为 None。
+    - on_sign(course, ok, skipped, error) 在每门课程处理完后调用，sign 抛出异常时 ok 为 False、error 为异常。
+    回调在调用方或 executor 的线程中调用，GUI 中应转交主线程更新界面。
+    返回 {days, failed_days, courses, signed, sign_failed, skipped}。
+    """
+    own_pool = executor is None
+    if own_pool:
+        executor = ThreadPoolExecutor(max_workers=max(1, min(fetch_workers, len(date_strs))) + sign_workers)
+    summary = {'days': 0, 'failed_days': 0, 'courses': 0, 'signed': 0, 'sign_failed': 0, 'skipped': 0}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(sign_workers)
+
+    def count(key, n=1):
+        with lock:
+            summary[key] += n
+
+    def sign_one(course):
+        error = None
+        try:
+            ok = bool(sign(course.id))
+        except Exception as e:
+            ok, error = False, e
+        finally:
+            slots.release()
+        count('signed' if ok else 'sign_failed')
+        _notify(on_sign, course, ok, False, error)
+
+    sign_futures = []
+    try:
+        day_futures = {executor.submit(index.day, date_str): date_str for date_str in date_strs}
+        for future in as_completed(day_futures):
+            try:
+                courses = future.result()
+            except Exception:
+                courses = None
+            count('days')
+            if courses is None:
+                count('failed_days')
+            else:
+                count('courses', len(courses))
+            _notify(on_day, day_futures[future], courses)
+            for course in courses or []:
+                if is_signed and is_signed(course.id):
+                    count('skipped')
+                    _notify(on_sign, course, True, True, None)
+                    continue
+                slots.acquire()
+                try:
+                    sign_futures.append(executor.submit(sign_one, course))
+                except BaseException:
+                    slots.release()
+                    raise
+        wait(sign_futures)
+    finally:
+        if own_pool:
+            executor.shutdown(wait=True)
+    return summary